@@ -1,7 +1,8 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 from strategies.markov_strategy import BaseStrategy
+from utils.instrumentation import timed
+from utils.optional import pyplot
 
 class Backtester:
     def __init__(self, data: pd.DataFrame, strategy: BaseStrategy, initial_capital: float = 10000.0):
@@ -10,24 +11,24 @@ class Backtester:
         self.initial_capital = initial_capital
         self.results = None
 
+    @timed('backtest.run')
     def run(self):
         close = self.data['close']
         if isinstance(close, pd.DataFrame):
             close = close.iloc[:, 0]  # use first column if multiple
 
-        signals = self.strategy.generate_signals(self.data)
-        positions = signals.replace(-1, 0).cumsum()
+        signals = self.strategy.generate_signals(self.data).reindex(close.index).fillna(0)
+        result = run_vectorized(close.to_numpy(dtype=float), signals.to_numpy(dtype=float),
+                                self.initial_capital)
         portfolio = pd.DataFrame(index=self.data.index)
-        portfolio['positions'] = positions
-        portfolio['holdings'] = close * portfolio['positions']
-        portfolio['cash'] = self.initial_capital - (signals * close).cumsum()
-        portfolio['total'] = portfolio['cash'] + portfolio['holdings']
-        portfolio['returns'] = portfolio['total'].pct_change().fillna(0)
+        for column in ('positions', 'holdings', 'cash', 'total', 'returns'):
+            portfolio[column] = result[column][:, 0, 0]
         self.results = portfolio
         return portfolio
 
     def plot(self):
         if self.results is not None:
+            plt = pyplot()
             self.results['total'].plot(title='Portfolio Value Over Time', figsize=(12, 6))
             plt.ylabel('Portfolio Value')
             plt.grid(True)
@@ -36,13 +37,257 @@ class Backtester:
             print("Run the backtest first.")
 
 
-def compute_metrics(portfolio: pd.DataFrame):
-    total_return = (portfolio['total'].iloc[-1] / portfolio['total'].iloc[0]) - 1
-    sharpe_ratio = (portfolio['returns'].mean() / portfolio['returns'].std()) * np.sqrt(252)
-    drawdown = portfolio['total'] / portfolio['total'].cummax() - 1
-    max_drawdown = drawdown.min()
+def compute_metrics(portfolio: pd.DataFrame, periods: int = 252):
+    # Turnover needs a 'positions' column (as in Backtester.run's portfolio) and is NaN without one.
+    positions = portfolio['positions'].to_numpy(dtype=float) if 'positions' in portfolio else None
+    metrics = compute_metrics_array(portfolio['total'].to_numpy(dtype=float),
+                                    portfolio['returns'].to_numpy(dtype=float), positions, periods)
+    return {k: float(v) for k, v in metrics.items()}
+
+
+def _as_tensor(close: np.ndarray, signals: np.ndarray):
+    # close: (time,) or (time x assets); signals: (time,), (time x assets) or (time x assets x parameter sets).
+    close = np.asarray(close, dtype=float)
+    signals = np.asarray(signals, dtype=float)
+    close = close.reshape(close.shape[0], -1)[:, :, None]
+    if signals.ndim == 1:
+        signals = signals[:, None, None]
+    elif signals.ndim == 2:
+        signals = signals[:, :, None]
+    return close, signals
+
+
+def run_vectorized(close: np.ndarray, signals: np.ndarray, initial_capital: float = 10000.0) -> dict:
+    # Same accounting as Backtester.run, for every (asset, parameter set) portfolio at once.
+    # Returns (time x assets x parameter sets) arrays.
+    close, signals = _as_tensor(close, signals)
+    return _portfolio(close, signals, 0.0, initial_capital, None)
+
+
+def _portfolio(close, signals, start_positions, start_cash, previous_total) -> dict:
+    positions = start_positions + np.cumsum(np.where(signals == -1, 0.0, signals), axis=0)
+    holdings = close * positions
+    cash = start_cash - np.cumsum(signals * close, axis=0)
+    total = cash + holdings
+    returns = np.zeros_like(total)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = total[1:] / total[:-1] - 1
+        if previous_total is not None:
+            returns[0] = total[0] / previous_total - 1
+    returns[np.isnan(returns)] = 0
+    return {
+        'positions': positions,
+        'holdings': holdings,
+        'cash': cash,
+        'total': total,
+        'returns': returns,
+    }
+
+
+class ChunkedBacktester:
+    # run_vectorized over consecutive time chunks, carrying positions, cash and equity across chunk
+    # boundaries so a long history can be backtested with bounded memory.
+    def __init__(self, initial_capital: float = 10000.0):
+        self.initial_capital = initial_capital
+        self.positions = 0.0
+        self.cash = initial_capital
+        self.total = None
+
+    def update(self, close: np.ndarray, signals: np.ndarray) -> dict:
+        close, signals = _as_tensor(close, signals)
+        result = _portfolio(close, signals, self.positions, self.cash, self.total)
+        if len(close) == 0:
+            return result
+        self.positions = result['positions'][-1]
+        self.cash = result['cash'][-1]
+        self.total = result['total'][-1]
+        return result
+
+
+def compute_metrics_array(total: np.ndarray, returns: np.ndarray, positions: np.ndarray = None,
+                          periods: int = 252) -> dict:
+    # compute_metrics along axis 0 of (time x ...) arrays, e.g. the output of run_vectorized. Same
+    # definitions as StreamingMetrics fed the totals (and positions) bar by bar.
+    total = np.asarray(total, dtype=float)
+    returns = np.asarray(returns, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total_return = total[-1] / total[0] - 1
+        count = np.sum(~np.isnan(returns), axis=0)
+        downside = np.sqrt(np.nansum(np.minimum(returns, 0) ** 2, axis=0) / count)
+        drawdown = total / np.fmax.accumulate(total, axis=0) - 1
+        if positions is None:
+            turnover = np.full(np.shape(total_return), np.nan)
+        else:
+            positions = np.asarray(positions, dtype=float).reshape(total.shape)
+            turnover = np.abs(np.diff(positions, axis=0, prepend=0.0)).sum(axis=0) / len(positions)
+        wins, losses = np.sum(returns > 0, axis=0), np.sum(returns < 0, axis=0)
+        return _ratios(total_return, np.nanmean(returns, axis=0), np.nanstd(returns, axis=0, ddof=1), downside,
+                       np.nanmin(drawdown, axis=0), total.shape[0] - 1, periods, turnover,
+                       wins / (wins + losses))
+
+
+def sweep_metrics(close: np.ndarray, signals: np.ndarray, initial_capital: float = 10000.0,
+                  chunk_size: int = 256) -> dict:
+    # Metrics for a large (time x assets x parameter sets) grid, run chunk by chunk along the
+    # parameter axis so the intermediate portfolio arrays stay bounded in memory. Signals keep
+    # their dtype (e.g. int8) and are cast to float one chunk at a time.
+    close = np.asarray(close, dtype=float)
+    close = close.reshape(close.shape[0], -1)[:, :, None]
+    signals = np.asarray(signals)
+    signals = signals.reshape(signals.shape[:2] + (-1,)) if signals.ndim > 1 else signals[:, None, None]
+    num_params = signals.shape[2]
+    metrics = None
+    for start in range(0, num_params, chunk_size):
+        result = run_vectorized(close, signals[:, :, start:start + chunk_size], initial_capital)
+        chunk = compute_metrics_array(result['total'], result['returns'], result['positions'])
+        if metrics is None:
+            metrics = {k: np.empty(v.shape[:1] + (num_params,)) for k, v in chunk.items()}
+        for k, v in chunk.items():
+            metrics[k][:, start:start + chunk_size] = v
+    return metrics
+
+
+class StreamingMetrics:
+    # compute_metrics maintained bar by bar in O(1): Welford mean/variance of returns, running
+    # peak and drawdown, plus Sortino, Calmar, turnover (mean |position change| per bar) and hit
+    # rate (share of non-zero returns that are positive). As in Backtester.run, the first bar has
+    # a return of 0, so after feeding a portfolio's totals and positions the metrics match
+    # compute_metrics.
+    def __init__(self, periods: int = 252):
+        self.periods = periods
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.downside = 0.0
+        self.wins = 0
+        self.losses = 0
+        self.first = None
+        self.last = None
+        self.peak = -np.inf
+        self.max_drawdown = 0.0
+        self.position = 0.0
+        self.traded = 0.0
+
+    def update(self, total: float, position: float = None):
+        total = float(total)
+        if self.last is None:
+            self.first = total
+            r = 0.0
+        else:
+            r = total / self.last - 1 if self.last else 0.0
+        self.last = total
+
+        self.count += 1
+        delta = r - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (r - self.mean)
+        if r < 0:
+            self.downside += r * r
+            self.losses += 1
+        elif r > 0:
+            self.wins += 1
+
+        self.peak = max(self.peak, total)
+        if self.peak:
+            self.max_drawdown = min(self.max_drawdown, total / self.peak - 1)
+        if position is not None:
+            self.traded += abs(position - self.position)
+            self.position = position
+        return r
+
+    def metrics(self) -> dict:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+            downside = np.sqrt(self.downside / self.count) if self.count else np.nan
+            total_return = self.last / self.first - 1 if self.count else np.nan
+            return _ratios(total_return, np.float64(self.mean), np.float64(std), np.float64(downside),
+                           np.float64(self.max_drawdown), max(self.count - 1, 0), self.periods,
+                           self.traded / self.count if self.count else np.nan,
+                           np.float64(self.wins) / (self.wins + self.losses))
+
+
+def _ratios(total_return, mean, std, downside, max_drawdown, elapsed, periods, turnover, hit_rate) -> dict:
+    annual_return = (1 + total_return) ** (periods / elapsed) - 1 if np.all(elapsed) else np.nan
     return {
         'Total Return': total_return,
-        'Sharpe Ratio': sharpe_ratio,
-        'Max Drawdown': max_drawdown
-    }
\ No newline at end of file
+        'Sharpe Ratio': mean / std * np.sqrt(periods),
+        'Sortino Ratio': mean / downside * np.sqrt(periods),
+        'Max Drawdown': max_drawdown,
+        'Calmar Ratio': annual_return / np.abs(max_drawdown),
+        'Turnover': turnover,
+        'Hit Rate': hit_rate,
+    }
+
+
+def rolling_metrics(total: np.ndarray, windows, positions: np.ndarray = None, periods: int = 252,
+                    max_elements: int = 1 << 22) -> dict:
+    # The StreamingMetrics ratios over trailing windows, for every portfolio of a (time x ...) array
+    # at once. The window of length w ending at t spans the equity points t-w..t and uses only the w
+    # returns between them. StreamingMetrics fed those same w + 1 points also counts a zero return
+    # for its first bar, so its mean-based ratios differ by O(1 / w).
+    # Returns (time x ...) arrays per metric (NaN until a full window is available), with a leading
+    # windows axis when `windows` is a list.
+    total = np.asarray(total, dtype=float)
+    T = total.shape[0]
+    returns = np.zeros_like(total)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = total[1:] / total[:-1] - 1
+    returns[~np.isfinite(returns)] = 0
+
+    # Shifting by each portfolio's mean keeps the cumulative sums well conditioned.
+    centered = returns - returns.mean(axis=0)
+
+    def cumulative(values):
+        out = np.zeros((T + 1,) + total.shape[1:])
+        np.cumsum(values, axis=0, out=out[1:])
+        return out
+
+    sums, squares = cumulative(centered), cumulative(centered ** 2)
+    downside = cumulative(np.minimum(returns, 0) ** 2)
+    wins, losses = cumulative(returns > 0), cumulative(returns < 0)
+    traded = None
+    if positions is not None:
+        positions = np.asarray(positions, dtype=float).reshape(total.shape)
+        traded = cumulative(np.abs(np.diff(positions, axis=0, prepend=0.0)))
+
+    names = ('Total Return', 'Sharpe Ratio', 'Sortino Ratio', 'Max Drawdown', 'Calmar Ratio', 'Turnover', 'Hit Rate')
+    results = []
+    for window in np.atleast_1d(windows):
+        window = int(window)
+        metrics = {k: np.full(total.shape, np.nan) for k in names}
+        results.append(metrics)
+        if window >= T:
+            continue
+
+        # Sums over returns t-w+1..t for every t >= w.
+        def window_sum(c):
+            return c[window + 1:] - c[1:T - window + 1]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s, q = window_sum(sums), window_sum(squares)
+            mean = s / window + returns.mean(axis=0)
+            std = np.sqrt(np.maximum(q - s * s / window, 0) / (window - 1))
+            w, l = window_sum(wins), window_sum(losses)
+            turnover = window_sum(traded) / window if traded is not None else np.nan
+            values = _ratios(total[window:] / total[:T - window] - 1, mean, std,
+                             np.sqrt(window_sum(downside) / window),
+                             _rolling_max_drawdown(total, window, max_elements), window, periods,
+                             turnover, w / (w + l))
+        for k, v in values.items():
+            metrics[k][window:] = v
+
+    if np.ndim(windows) == 0:
+        return results[0]
+    return {k: np.stack([m[k] for m in results]) for k in results[0]}
+
+
+def _rolling_max_drawdown(total: np.ndarray, window: int, max_elements: int) -> np.ndarray:
+    # Max drawdown of every span of window + 1 equity points, in time blocks of bounded size.
+    views = np.moveaxis(np.lib.stride_tricks.sliding_window_view(total, window + 1, axis=0), -1, 1)
+    out = np.empty((views.shape[0],) + total.shape[1:])
+    block = max(max_elements // max(views[0].size, 1), 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for start in range(0, views.shape[0], block):
+            span = views[start:start + block]
+            out[start:start + block] = (span / np.maximum.accumulate(span, axis=1) - 1).min(axis=1)
+    return out
@@ -0,0 +1,271 @@
+import argparse
+import cProfile
+import gc
+import io
+import json
+import platform
+import pstats
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from backtester import Backtester
+from benchmarks.synthetic import synthetic_close, synthetic_ohlcv
+from models.fourier_filter import FourierFilter
+from models.kalman_filter import KalmanFilter
+from strategies.fourier_strategy import FourierCycleStrategy
+from strategies.kalman_strategy import KalmanTrendStrategy
+from strategies.markov_strategy import OrderNMarkovModel
+from strategies.meta_strategy import MetaStrategy
+from strategies.q_learning_strategy import QLearningStrategy
+from utils.state_encoder import encode_states
+
+# Benchmarks of the hot paths over synthetic data, e.g.
+#   python -m benchmarks.bench --preset quick --save-baseline benchmarks/baseline.json
+#   python -m benchmarks.bench --preset quick --baseline benchmarks/baseline.json
+#   python -m benchmarks.bench --cases kalman --bars 100000 --profile cprofile
+#
+# Throughput is bars x tickers per second of the best repeat; peak memory is measured in a separate
+# run under tracemalloc (which NumPy reports its buffers to). Combinations above a case's
+# `max_elements` are skipped, as are all above --max-elements.
+
+PRESETS = {
+    'quick': {'bars': [1_000, 10_000, 100_000], 'tickers': [1, 10]},
+    'full': {'bars': [1_000, 10_000, 100_000, 1_000_000, 10_000_000], 'tickers': [1, 10, 100, 1000]},
+}
+
+
+def _frame(bars, tickers, seed=0):
+    # Single ticker: OHLCV plus the filter columns. Several: the same columns as (time x tickers) panels.
+    if tickers == 1:
+        data = synthetic_ohlcv(bars, seed)
+        data['kalman'] = KalmanFilter().apply(data['close'])
+        data['fourier'] = FourierFilter().apply(data['close'])
+    else:
+        close = synthetic_close(bars, tickers, seed)
+        data = pd.concat({'close': close, 'kalman': KalmanFilter().apply(close),
+                          'fourier': FourierFilter().apply(close)}, axis=1)
+    return data
+
+
+def _tickers(data):
+    # Single-ticker frames for the code paths that do not take panels.
+    close = data['close']
+    if not isinstance(close, pd.DataFrame):
+        return [data]
+    return [pd.DataFrame({name: data[name][ticker] for name in ('close', 'kalman', 'fourier')})
+            for ticker in close.columns]
+
+
+def _setup_kalman(data):
+    close = data['close']
+    return lambda: KalmanFilter().apply(close)
+
+
+def _setup_fourier(data):
+    close = data['close']
+    return lambda: FourierFilter().apply(close)
+
+
+def _setup_markov_fit(data):
+    states = [encode_states(frame) for frame in _tickers(data)]
+    return lambda: [OrderNMarkovModel(order=2).fit(s) for s in states]
+
+
+def _setup_q_train(data):
+    strategies = [QLearningStrategy(frame) for frame in _tickers(data)]
+    for strategy in strategies:
+        strategy._state_codes()  # discretization is benchmarked separately from the episode loop
+
+    def run():
+        for strategy in strategies:
+            strategy.train(episodes=1)
+    return run
+
+
+def _setup_meta_signals(data):
+    meta = MetaStrategy([KalmanTrendStrategy(data), FourierCycleStrategy(data)], max_workers=1)
+
+    def run():
+        meta.clear_cache()
+        return meta.generate_signals(data)
+    return run
+
+
+def _setup_backtest(data):
+    frames = _tickers(data)
+    backtesters = [Backtester(frame, KalmanTrendStrategy(frame)) for frame in frames]
+    return lambda: [b.run() for b in backtesters]
+
+
+CASES = {
+    'kalman': (_setup_kalman, 10 ** 9),
+    'fourier': (_setup_fourier, 10 ** 9),
+    'markov_fit': (_setup_markov_fit, 10 ** 8),
+    'q_train': (_setup_q_train, 10 ** 6),
+    'meta_signals': (_setup_meta_signals, 10 ** 9),
+    'backtest': (_setup_backtest, 10 ** 8),
+}
+
+
+def _time(func, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _peak_memory(func):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _profile(name, func, mode, top):
+    if mode == 'line':
+        try:
+            from line_profiler import LineProfiler
+        except ImportError:
+            print("line_profiler is not installed; falling back to cProfile")
+            mode = 'cprofile'
+        else:
+            profiler = LineProfiler()
+            for target in LINE_TARGETS.get(name, ()):
+                profiler.add_function(target)
+            profiler.runcall(func)
+            profiler.print_stats()
+            return
+    profiler = cProfile.Profile()
+    profiler.runcall(func)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(top)
+    print(out.getvalue())
+
+
+LINE_TARGETS = {
+    'kalman': (KalmanFilter.apply_array,),
+    'fourier': (FourierFilter.apply_array,),
+    'markov_fit': (OrderNMarkovModel.partial_fit,),
+    'q_train': (QLearningStrategy.train,),
+    'meta_signals': (MetaStrategy.child_signals, MetaStrategy.generate_signals),
+    'backtest': (Backtester.run,),
+}
+
+
+def run(cases, bars_list, tickers_list, repeat=3, memory=True, max_elements=5 * 10 ** 7,
+        profile=None, top=15) -> list:
+    results = []
+    for bars in bars_list:
+        for tickers in tickers_list:
+            elements = bars * tickers
+            runnable = [c for c in cases if elements <= min(CASES[c][1], max_elements)]
+            if not runnable:
+                continue
+            data = _frame(bars, tickers)
+            for name in runnable:
+                func = CASES[name][0](data)
+                seconds = _time(func, repeat)
+                peak = _peak_memory(func) if memory else None
+                results.append({
+                    'case': name,
+                    'bars': bars,
+                    'tickers': tickers,
+                    'seconds': seconds,
+                    'throughput': elements / seconds,
+                    'peak_bytes': peak,
+                })
+                print(f"{name:>14} {bars:>10,} bars x {tickers:>4} tickers: {seconds * 1e3:10.2f} ms "
+                      f"{elements / seconds:14,.0f} bars/s"
+                      + (f" {peak / 2 ** 20:9.1f} MiB peak" if peak is not None else ""))
+                if profile:
+                    _profile(name, func, profile, top)
+            del data
+    return results
+
+
+def scaling(results: list) -> pd.DataFrame:
+    # Empirical exponent of time vs. problem size per case (1.0 = linear), plus the throughput curve.
+    frame = pd.DataFrame(results)
+    rows = []
+    for name, group in frame.groupby('case'):
+        elements = group['bars'] * group['tickers']
+        exponent = np.nan
+        if elements.nunique() > 1:
+            exponent = np.polyfit(np.log(elements), np.log(group['seconds']), 1)[0]
+        rows.append({'case': name, 'exponent': exponent,
+                     'min_throughput': group['throughput'].min(), 'max_throughput': group['throughput'].max()})
+    return pd.DataFrame(rows).set_index('case')
+
+
+def compare(results: list, baseline: list, tolerance: float = 0.2) -> list:
+    # Results whose throughput fell more than `tolerance` below the baseline for the same size.
+    reference = {(r['case'], r['bars'], r['tickers']): r for r in baseline}
+    regressions = []
+    for r in results:
+        base = reference.get((r['case'], r['bars'], r['tickers']))
+        if base is None:
+            continue
+        ratio = r['throughput'] / base['throughput']
+        status = 'REGRESSION' if ratio < 1 - tolerance else 'ok'
+        print(f"{r['case']:>14} {r['bars']:>10,} x {r['tickers']:>4}: {ratio:6.2f}x baseline {status}")
+        if status != 'ok':
+            regressions.append({**r, 'baseline_throughput': base['throughput'], 'ratio': ratio})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the models, strategies and backtester.")
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='quick')
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--bars', nargs='+', type=int, help="overrides the preset's bar counts")
+    parser.add_argument('--tickers', nargs='+', type=int, help="overrides the preset's ticker counts")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-elements', type=int, default=5 * 10 ** 7)
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc peak-memory run")
+    parser.add_argument('--profile', choices=['cprofile', 'line'])
+    parser.add_argument('--top', type=int, default=15, help="rows of cProfile output per case")
+    parser.add_argument('--output', help="write results as JSON")
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--baseline', metavar='PATH', help="compare against a saved baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    preset = PRESETS[args.preset]
+    results = run(args.cases, args.bars or preset['bars'], args.tickers or preset['tickers'],
+                  repeat=args.repeat, memory=not args.no_memory, max_elements=args.max_elements,
+                  profile=args.profile, top=args.top)
+    print()
+    print(scaling(results).to_string(float_format=lambda v: f"{v:,.2f}"))
+
+    report = {
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        print()
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+
+def synthetic_close(bars: int, tickers: int = 1, seed: int = 0, freq: str = 'min') -> pd.DataFrame:
+    # (bars x tickers) geometric random-walk closes with a slow cycle, so the filters have
+    # something to track.
+    rng = np.random.default_rng(seed)
+    t = np.arange(bars)[:, None]
+    log_returns = rng.normal(0, 0.001, (bars, tickers)) + 0.0005 * np.sin(2 * np.pi * t / 390)
+    close = 100 * np.exp(np.cumsum(log_returns, axis=0))
+    index = pd.date_range('2000-01-01', periods=bars, freq=freq)
+    return pd.DataFrame(close, index=index, columns=[f'T{i:04d}' for i in range(tickers)])
+
+
+def synthetic_ohlcv(bars: int, seed: int = 0, freq: str = 'min') -> pd.DataFrame:
+    # One ticker's OHLCV bars around synthetic_close.
+    rng = np.random.default_rng(seed + 1)
+    close = synthetic_close(bars, 1, seed, freq).iloc[:, 0]
+    spread = np.abs(rng.normal(0, 0.0005, (bars, 2))) * close.to_numpy()[:, None]
+    open_ = close.shift(1).fillna(close.iloc[0] if bars else 0.0)
+    return pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) + spread[:, 0],
+        'low': np.minimum(open_, close) - spread[:, 1],
+        'close': close,
+        'volume': rng.integers(100, 10000, bars).astype(float),
+    }, index=close.index)
@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from backtester import Backtester, compute_metrics
+from data_loader.data_loader import DataLoader
+from strategies.fourier_strategy import FourierCycleStrategy
+from strategies.kalman_strategy import KalmanTrendStrategy
+from strategies.meta_strategy import MetaStrategy
+from strategies.q_learning_strategy import QLearningStrategy
+from utils import instrumentation
+from utils.feature_pipeline import default_pipeline
+from utils.optional import pyplot
+
+# Headless batch runner: backtests the configured strategy mix over many symbols, e.g.
+#   python cli.py AAPL MSFT NVDA --start 2023-01-01 --end 2023-06-30 --workers 3 --output results.csv
+#   python cli.py AAPL --csv-dir data/ --config pipeline.json --plots plots/
+#
+# Only numpy and pandas are needed unless --plots/--show (matplotlib) or Yahoo downloads
+# (yfinance) are used. A --config JSON file overrides any part of DEFAULT_CONFIG.
+
+DEFAULT_CONFIG = {
+    'initial_capital': 10000.0,
+    'features': {'fourier': {'keep_ratio': 0.03}},
+    'strategies': {
+        'kalman': {'weight': 0.3, 'slope_threshold': 0.001},
+        'fourier': {'weight': 0.3, 'threshold': 0.01},
+        'q_learning': {'weight': 0.4, 'bins': 10, 'episodes': 50},
+    },
+}
+
+STRATEGIES = {
+    'kalman': KalmanTrendStrategy,
+    'fourier': FourierCycleStrategy,
+    'q_learning': QLearningStrategy,
+}
+
+
+def load_config(path: str = None) -> dict:
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    if path:
+        with open(path) as f:
+            overrides = json.load(f)
+        for key, value in overrides.items():
+            if isinstance(value, dict) and key != 'strategies':
+                config[key] = {**config.get(key, {}), **value}
+            else:
+                config[key] = value
+    unknown = set(config['strategies']) - set(STRATEGIES)
+    if unknown:
+        raise ValueError(f"Unknown strategies in config: {sorted(unknown)}")
+    return config
+
+
+def load_data(symbol: str, options: dict) -> pd.DataFrame:
+    if options['csv_dir']:
+        return DataLoader(os.path.join(options['csv_dir'], f"{symbol}.csv")).load()
+    return DataLoader.fetch(symbol, options['start'], options['end'], options['interval'],
+                            cache_dir=options['cache_dir'])
+
+
+def build_strategy(data: pd.DataFrame, config: dict) -> MetaStrategy:
+    features = default_pipeline()
+    for name, params in config['features'].items():
+        features.configure(name, **params)
+    features.materialize(data, ['kalman', 'fourier'])
+
+    strategies, weights = [], []
+    for name, params in config['strategies'].items():
+        params = dict(params)
+        weights.append(params.pop('weight', 1.0))
+        episodes = params.pop('episodes', None)
+        strategy = STRATEGIES[name](data, features=features, **params)
+        if episodes is not None:
+            strategy.train(episodes=episodes)
+        strategies.append(strategy)
+    return MetaStrategy(strategies=strategies, weights=weights)
+
+
+def run_symbol(symbol: str, config: dict, options: dict) -> dict:
+    started = time.perf_counter()
+    if options['instrument']:
+        instrumentation.reset()
+        instrumentation.enable()
+    row = {'symbol': symbol}
+    try:
+        data = load_data(symbol, options)
+        if data is None or data.empty:
+            raise ValueError("no data")
+        meta = build_strategy(data, config)
+        backtester = Backtester(data, meta, initial_capital=config['initial_capital'])
+        portfolio = backtester.run()
+        row.update(compute_metrics(portfolio))
+        row['bars'] = len(data)
+        if options['plots'] or options['show']:
+            _plot(symbol, backtester, meta, data, options)
+    except Exception as e:
+        print(f"Error running {symbol}: {e}")
+        row['error'] = str(e)
+    row['seconds'] = time.perf_counter() - started
+    return {'row': row, 'instrumentation': instrumentation.snapshot() if options['instrument'] else None}
+
+
+def _plot(symbol, backtester, meta, data, options):
+    plt = pyplot()
+    if not options['show']:
+        plt.switch_backend('Agg')
+    backtester.plot()
+    if options['plots']:
+        plt.savefig(os.path.join(options['plots'], f"{symbol}_portfolio.png"))
+    meta.plot_signals(meta.generate_signals(data), data)
+    if options['plots']:
+        plt.savefig(os.path.join(options['plots'], f"{symbol}_signals.png"))
+    plt.close('all')
+
+
+def _run(task):
+    return run_symbol(*task)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Backtest the configured strategies over many symbols.")
+    parser.add_argument('symbols', nargs='*', help="symbols to run (or use --symbols-file)")
+    parser.add_argument('--symbols-file', help="file with one symbol per line")
+    parser.add_argument('--start', default="2023-01-01")
+    parser.add_argument('--end', default="2023-01-31")
+    parser.add_argument('--interval', default="1d")
+    parser.add_argument('--csv-dir', help="read <symbol>.csv files instead of downloading")
+    parser.add_argument('--cache-dir', help="local market data cache for downloads")
+    parser.add_argument('--config', help="JSON pipeline config overriding the defaults")
+    parser.add_argument('--workers', type=int, default=1, help="symbols run in parallel processes")
+    parser.add_argument('--output', help="write per-symbol metrics (.csv or .json)")
+    parser.add_argument('--plots', help="save portfolio and signal plots to this directory")
+    parser.add_argument('--show', action='store_true', help="display plots interactively")
+    parser.add_argument('--instrument', action='store_true', help="time the pipeline stages")
+    parser.add_argument('--metrics-out', default="run_metrics",
+                        help="instrumentation export prefix (.json and .prom are written)")
+    args = parser.parse_args(argv)
+
+    symbols = list(args.symbols)
+    if args.symbols_file:
+        with open(args.symbols_file) as f:
+            symbols += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    if not symbols:
+        parser.error("no symbols given")
+    if args.plots:
+        os.makedirs(args.plots, exist_ok=True)
+
+    config = load_config(args.config)
+    options = {
+        'start': args.start,
+        'end': args.end,
+        'interval': args.interval,
+        'csv_dir': args.csv_dir,
+        'cache_dir': args.cache_dir,
+        'plots': args.plots,
+        'show': args.show,
+        'instrument': args.instrument,
+    }
+    tasks = [(symbol, config, options) for symbol in symbols]
+    if args.workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            outputs = list(pool.map(_run, tasks))
+    else:
+        outputs = [_run(task) for task in tasks]
+
+    results = pd.DataFrame([o['row'] for o in outputs]).set_index('symbol')
+    with pd.option_context('display.float_format', '{:.4f}'.format, 'display.width', 120,
+                           'display.max_columns', None):
+        print(results)
+    if args.output:
+        if args.output.endswith('.json'):
+            results.reset_index().to_json(args.output, orient='records', indent=2)
+        else:
+            results.to_csv(args.output)
+
+    if args.instrument:
+        instrumentation.reset()
+        for output in outputs:
+            instrumentation.merge(output['instrumentation'])
+        instrumentation.report()
+        instrumentation.export(f"{args.metrics_out}.json")
+        instrumentation.export(f"{args.metrics_out}.prom")
+    return 1 if 'error' in results.columns and results['error'].notna().any() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
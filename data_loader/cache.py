@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader.providers import OHLCV, YahooProvider
+
+
+class MarketDataCache:
+    # On-disk OHLCV store: one directory per (symbol, interval), named by a hash of that key, holding
+    # one .npy file per column plus meta.json with the date ranges already fetched. Loads are
+    # memory-mapped, and fetch() only asks the provider for the parts of a range not yet covered.
+    def __init__(self, root: str, provider=None):
+        self.root = root
+        self.provider = provider or YahooProvider()
+
+    def _path(self, symbol: str, interval: str) -> str:
+        key = hashlib.sha1(f"{symbol}|{interval}".encode()).hexdigest()[:16]
+        return os.path.join(self.root, key)
+
+    def _read_meta(self, path: str) -> dict:
+        meta_file = os.path.join(path, 'meta.json')
+        if not os.path.exists(meta_file):
+            return None
+        with open(meta_file) as f:
+            return json.load(f)
+
+    def load_arrays(self, symbol: str, interval: str = "1d") -> dict:
+        # Zero-copy view of the cached columns; 'timestamp' is int64 nanoseconds.
+        path = self._path(symbol, interval)
+        meta = self._read_meta(path)
+        if meta is None:
+            return None
+        return {c: np.load(os.path.join(path, f"{c}.npy"), mmap_mode='r') for c in ['timestamp'] + meta['columns']}
+
+    def load(self, symbol: str, interval: str = "1d", start=None, end=None) -> pd.DataFrame:
+        arrays = self.load_arrays(symbol, interval)
+        if arrays is None:
+            return None
+        timestamps = arrays.pop('timestamp')
+        lo = 0 if start is None else np.searchsorted(timestamps, pd.Timestamp(start).value, side='left')
+        hi = len(timestamps) if end is None else np.searchsorted(timestamps, pd.Timestamp(end).value, side='left')
+        index = pd.DatetimeIndex(np.asarray(timestamps[lo:hi]).view('datetime64[ns]'), name='timestamp')
+        return pd.DataFrame({c: a[lo:hi] for c, a in arrays.items()}, index=index)
+
+    def missing_ranges(self, symbol: str, start, end, interval: str = "1d") -> list:
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        meta = self._read_meta(self._path(symbol, interval))
+        covered = [] if meta is None else [(pd.Timestamp(a), pd.Timestamp(b)) for a, b in meta['coverage']]
+
+        gaps = []
+        cursor = start
+        for lo, hi in covered:
+            if hi <= cursor:
+                continue
+            if lo >= end:
+                break
+            if lo > cursor:
+                gaps.append((cursor, lo))
+            cursor = max(cursor, hi)
+        if cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def fetch(self, symbol: str, start, end, interval: str = "1d") -> pd.DataFrame:
+        gaps = self.missing_ranges(symbol, start, end, interval)
+        # Ranges ending before today are history: once bars come back, the whole gap is covered.
+        # A range reaching today or later is open, so coverage stops at the last bar received
+        # and that bar and anything after it are fetched again next time.
+        today = pd.Timestamp.now(tz='UTC').tz_localize(None).normalize()
+        frames, covered = [], []
+        for lo, hi in gaps:
+            try:
+                frame = self.provider.fetch(symbol, lo, hi, interval)
+            except Exception as e:
+                # Offline or a failing provider: serve what is cached and retry the gap next time.
+                print(f"Error fetching {symbol} {lo} to {hi}: {e}")
+                continue
+            # An empty or missing result (failed download) leaves the gap to be retried.
+            if frame is None or len(frame) == 0:
+                continue
+            frame = _naive_utc(frame)
+            frames.append(frame)
+            last = hi if hi < today else min(pd.DatetimeIndex(frame.index).max(), hi)
+            if last > lo:
+                covered.append((lo, last))
+        if frames:
+            self._store(symbol, interval, frames, covered)
+        data = self.load(symbol, interval, start, end)
+        if data is None:
+            return pd.DataFrame(columns=OHLCV, dtype=float, index=pd.DatetimeIndex([], name='timestamp'))
+        return data
+
+    def _store(self, symbol: str, interval: str, frames: list, ranges: list):
+        path = self._path(symbol, interval)
+        os.makedirs(path, exist_ok=True)
+        meta = self._read_meta(path) or {'symbol': symbol, 'interval': interval, 'columns': OHLCV, 'coverage': []}
+
+        existing = self.load(symbol, interval)
+        parts = ([existing.copy()] if existing is not None else []) + [_naive_utc(f[meta['columns']]) for f in frames if len(f)]
+        merged = pd.concat(parts) if parts else pd.DataFrame(columns=meta['columns'], dtype=float)
+        merged.index = pd.DatetimeIndex(merged.index).as_unit('ns')
+        merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+
+        columns = {'timestamp': merged.index.asi8}
+        columns.update({c: merged[c].to_numpy(dtype=float) for c in meta['columns']})
+        for name, values in columns.items():
+            # Write next to the target and rename, so a crash never leaves a half-written column.
+            tmp = os.path.join(path, f"{name}.tmp.npy")
+            np.save(tmp, values)
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+
+        coverage = [(pd.Timestamp(a), pd.Timestamp(b)) for a, b in meta['coverage']]
+        coverage += [(pd.Timestamp(a), pd.Timestamp(b)) for a, b in ranges]
+        meta['coverage'] = [[a.isoformat(), b.isoformat()] for a, b in _merge_ranges(coverage)]
+        tmp = os.path.join(path, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, 'meta.json'))
+
+
+def _naive_utc(df: pd.DataFrame) -> pd.DataFrame:
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None:
+        df = df.set_axis(index.tz_convert('UTC').tz_localize(None))
+    return df
+
+
+def _merge_ranges(ranges: list) -> list:
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
@@ -1,10 +1,21 @@
+import json
+import os
+
+import numpy as np
 import pandas as pd
-import yfinance as yf
+from data_loader.cache import MarketDataCache
+from data_loader.providers import OHLCV, YahooProvider
+from utils.instrumentation import timed
+from utils.optional import require
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
 
 class DataLoader:
     def __init__(self, filepath=None):
         self.filepath = filepath
 
+    @timed('load.csv')
     def load(self):
         if self.filepath:
             df = pd.read_csv(self.filepath, parse_dates=['timestamp'])
@@ -14,9 +25,82 @@ class DataLoader:
         else:
             raise ValueError("No file path provided")
 
+    def iter_chunks(self, chunksize: int = 1_000_000, downcast: bool = True, overlap: int = 0):
+        # Streams the CSV as time-ordered chunks of at most `chunksize` rows. With `overlap`, each
+        # chunk after the first starts with the last `overlap` rows of the previous one, so rolling
+        # and diff-based computations can be run per chunk and the first `overlap` rows dropped.
+        if not self.filepath:
+            raise ValueError("No file path provided")
+
+        reader = pd.read_csv(self.filepath, parse_dates=['timestamp'], usecols=['timestamp'] + OHLCV,
+                             chunksize=chunksize)
+        tail = None
+        for chunk in reader:
+            chunk = chunk.set_index('timestamp')[OHLCV].dropna()
+            if downcast:
+                chunk = _downcast(chunk)
+            if not chunk.index.is_monotonic_increasing or (
+                    tail is not None and len(tail) and len(chunk) and chunk.index[0] < tail.index[-1]):
+                raise ValueError(f"{self.filepath} is not sorted by timestamp")
+
+            out = chunk if tail is None or overlap == 0 else pd.concat([tail, chunk])
+            if overlap:
+                tail = out.iloc[-overlap:]
+            elif len(chunk):
+                tail = chunk.iloc[-1:]
+            yield out
+
+    @timed('load.memmap')
+    def to_memmap(self, directory: str, chunksize: int = 1_000_000, downcast: bool = True) -> dict:
+        # Converts the CSV chunk by chunk into one raw binary file per column plus meta.json,
+        # then returns the memory-mapped columns (see load_memmap).
+        os.makedirs(directory, exist_ok=True)
+        files = {}
+        dtypes = {}
+        rows = 0
+        try:
+            for chunk in self.iter_chunks(chunksize=chunksize, downcast=downcast):
+                columns = {'timestamp': chunk.index.as_unit('ns').asi8}
+                columns.update({c: chunk[c].to_numpy() for c in OHLCV})
+                for name, values in columns.items():
+                    path = os.path.join(directory, f"{name}.bin")
+                    if name not in files:
+                        files[name] = open(path, 'wb')
+                        dtypes[name] = values.dtype.str
+                    elif values.dtype.kind == 'f' and np.dtype(dtypes[name]).kind != 'f':
+                        # Fractional volume after whole-number chunks: earlier rows become float64 too.
+                        files[name].close()
+                        _widen_to_float(path, rows, dtypes[name])
+                        files[name] = open(path, 'ab')
+                        dtypes[name] = np.dtype(np.float64).str
+                    files[name].write(np.ascontiguousarray(values, dtype=dtypes[name]).tobytes())
+                rows += len(chunk)
+        finally:
+            for f in files.values():
+                f.close()
+
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump({'rows': rows, 'dtypes': dtypes}, f)
+        return DataLoader.load_memmap(directory)
+
+    @staticmethod
+    def load_memmap(directory: str) -> dict:
+        # Read-only memory-mapped OHLCV columns; 'timestamp' is int64 nanoseconds.
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['rows'] == 0:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in meta['dtypes'].items()}
+        return {
+            name: np.memmap(os.path.join(directory, f"{name}.bin"), dtype=np.dtype(dtype), mode='r',
+                            shape=(meta['rows'],))
+            for name, dtype in meta['dtypes'].items()
+        }
+
     @staticmethod
+    @timed('load.yahoo')
     def fetch_yahoo(symbol: str, start: str, end: str, interval: str = "1d"):
         try:
+            yf = require('yfinance')
             data = yf.download(symbol, start=start, end=end, interval=interval)
             data.reset_index(inplace=True)
             data.rename(columns={
@@ -33,3 +117,34 @@ class DataLoader:
         except Exception as e:
             print(f"Error fetching data for {symbol}: {e}")
             return None
+
+    @staticmethod
+    @timed('load.fetch')
+    def fetch(symbol: str, start: str, end: str, interval: str = "1d", provider=None, cache_dir: str = None):
+        # Provider-backed fetch; with a cache_dir, only ranges missing from the local store are downloaded.
+        try:
+            if cache_dir:
+                return MarketDataCache(cache_dir, provider).fetch(symbol, start, end, interval)
+            return (provider or YahooProvider()).fetch(symbol, start, end, interval)
+        except Exception as e:
+            print(f"Error fetching data for {symbol}: {e}")
+            return None
+
+
+def _downcast(chunk: pd.DataFrame) -> pd.DataFrame:
+    # float32 prices; volume becomes int64 only when every value in the chunk is a whole number, so
+    # fractional volumes (crypto, FX, adjusted) are kept as float64 rather than truncated.
+    volume = chunk['volume'].to_numpy(dtype=float)
+    integral = bool(np.all(np.isfinite(volume) & (volume == np.round(volume))))
+    return chunk.astype({**{c: np.float32 for c in PRICE_COLUMNS}, 'volume': np.int64 if integral else np.float64})
+
+
+def _widen_to_float(path: str, rows: int, dtype: str):
+    # Rewrites a column file of `rows` integers as float64, in blocks to keep memory bounded.
+    values = np.memmap(path, dtype=np.dtype(dtype), mode='r', shape=(rows,)) if rows else np.empty(0, dtype=dtype)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        for lo in range(0, rows, 1_000_000):
+            f.write(np.asarray(values[lo:lo + 1_000_000], dtype=np.float64).tobytes())
+    del values
+    os.replace(tmp, path)
@@ -0,0 +1,73 @@
+import asyncio
+import heapq
+from typing import NamedTuple
+
+import pandas as pd
+
+from data_loader.data_loader import DataLoader
+
+
+class Bar(NamedTuple):
+    symbol: str
+    timestamp: pd.Timestamp
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+def _bars(symbol: str, frames):
+    for frame in frames:
+        for row in frame[['open', 'high', 'low', 'close', 'volume']].itertuples():
+            yield Bar(symbol, row.Index, float(row.open), float(row.high), float(row.low),
+                      float(row.close), float(row.volume))
+
+
+class ReplayFeed:
+    # Replays historical bars for many symbols, merged in timestamp order. With speed > 0 the gaps
+    # between timestamps are slept through, scaled down by `speed`; with 0 bars are pushed as fast
+    # as the consumer takes them.
+    def __init__(self, sources: dict, speed: float = 0.0):
+        # sources: symbol -> DataFrame, or symbol -> iterable of time-ordered DataFrame chunks.
+        self.sources = sources
+        self.speed = speed
+
+    @classmethod
+    def from_csv(cls, paths: dict, chunksize: int = 100_000, speed: float = 0.0):
+        # Streams each file chunk by chunk, so replaying a long history needs bounded memory.
+        return cls({symbol: DataLoader(path).iter_chunks(chunksize=chunksize) for symbol, path in paths.items()},
+                   speed=speed)
+
+    async def stream(self):
+        iterators = [_bars(symbol, [source] if isinstance(source, pd.DataFrame) else source)
+                     for symbol, source in self.sources.items()]
+        previous = None
+        for bar in heapq.merge(*iterators, key=lambda b: b.timestamp):
+            if self.speed > 0 and previous is not None:
+                await asyncio.sleep(max((bar.timestamp - previous).total_seconds(), 0) / self.speed)
+            else:
+                await asyncio.sleep(0)
+            previous = bar.timestamp
+            yield bar
+
+
+class QueueFeed:
+    # Local stand-in for a live feed: producers put() bars and close() when done.
+    _DONE = object()
+
+    def __init__(self, maxsize: int = 0):
+        self.queue = asyncio.Queue(maxsize)
+
+    async def put(self, bar: Bar):
+        await self.queue.put(bar)
+
+    async def close(self):
+        await self.queue.put(self._DONE)
+
+    async def stream(self):
+        while True:
+            bar = await self.queue.get()
+            if bar is self._DONE:
+                return
+            yield bar
@@ -0,0 +1,45 @@
+import os
+
+import pandas as pd
+
+from utils.optional import require
+
+OHLCV = ['open', 'high', 'low', 'close', 'volume']
+
+
+class DataProvider:
+    # Returns OHLCV bars in [start, end) indexed by 'timestamp', with flat lower-case columns.
+    def fetch(self, symbol: str, start, end, interval: str = "1d") -> pd.DataFrame:
+        raise NotImplementedError("Must implement fetch method")
+
+
+class YahooProvider(DataProvider):
+    def fetch(self, symbol: str, start, end, interval: str = "1d") -> pd.DataFrame:
+        yf = require('yfinance')
+        data = yf.download(symbol, start=start, end=end, interval=interval, progress=False)
+        if isinstance(data.columns, pd.MultiIndex):
+            data.columns = data.columns.get_level_values(0)
+        data.columns = [str(c).lower() for c in data.columns]
+        data.index.name = 'timestamp'
+        return data[OHLCV]
+
+
+class LocalProvider(DataProvider):
+    # Serves bars from in-memory frames or from `<directory>/<symbol>.csv` files; a stand-in for
+    # YahooProvider on offline machines and in tests.
+    def __init__(self, frames: dict = None, directory: str = None):
+        self.frames = dict(frames or {})
+        self.directory = directory
+
+    def _frame(self, symbol: str) -> pd.DataFrame:
+        if symbol not in self.frames:
+            if self.directory is None:
+                raise KeyError(f"No local data for {symbol}")
+            path = os.path.join(self.directory, f"{symbol}.csv")
+            df = pd.read_csv(path, parse_dates=['timestamp']).set_index('timestamp')
+            self.frames[symbol] = df[OHLCV].sort_index()
+        return self.frames[symbol]
+
+    def fetch(self, symbol: str, start, end, interval: str = "1d") -> pd.DataFrame:
+        df = self._frame(symbol)
+        return df[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
@@ -0,0 +1,159 @@
+import asyncio
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+
+class SimulatedBroker:
+    # Fills market orders on the first bar of their symbol that arrives at least `latency` after
+    # submission (and strictly after the submitting bar), at that bar's open plus slippage.
+    def __init__(self, initial_capital: float = 10000.0, latency=pd.Timedelta(0), slippage_bps: float = 0.0,
+                 commission: float = 0.0, commission_pct: float = 0.0):
+        self.cash = initial_capital
+        self.initial_capital = initial_capital
+        self.latency = pd.Timedelta(latency)
+        self.slippage_bps = slippage_bps
+        self.commission = commission
+        self.commission_pct = commission_pct
+        self.positions = defaultdict(float)
+        self.last_price = {}
+        self.pending = defaultdict(list)
+        self.fills = []
+
+    def submit(self, symbol: str, quantity: float, timestamp):
+        if quantity:
+            self.pending[symbol].append((timestamp, quantity))
+
+    def on_bar(self, bar):
+        orders = self.pending[bar.symbol]
+        ready = [o for o in orders if bar.timestamp > o[0] and bar.timestamp >= o[0] + self.latency]
+        if ready:
+            self.pending[bar.symbol] = [o for o in orders if o not in ready]
+        for submitted, quantity in ready:
+            price = bar.open * (1 + np.sign(quantity) * self.slippage_bps / 1e4)
+            cost = abs(quantity) * price
+            fee = self.commission + self.commission_pct * cost
+            self.cash -= quantity * price + fee
+            self.positions[bar.symbol] += quantity
+            self.fills.append((bar.symbol, submitted, bar.timestamp, quantity, price, fee))
+        self.last_price[bar.symbol] = bar.close
+
+    def equity(self) -> float:
+        return self.cash + sum(q * self.last_price.get(s, 0.0) for s, q in self.positions.items())
+
+
+class EventEngine:
+    # asyncio event loop for streaming backtests and paper trading. A feed pushes bars; each symbol
+    # gets its own queue and worker task, which runs the symbol's StreamingStrategy.on_bar and turns
+    # the signal into an order of `signal * units` on the simulated broker.
+    #
+    # strategies maps symbol -> StreamingStrategy, or is a callable symbol -> StreamingStrategy used
+    # for every symbol the feed produces.
+    STAGES = ('queue', 'strategy', 'broker', 'total')
+
+    def __init__(self, feed, strategies, broker: SimulatedBroker = None, units: float = 1.0, queue_size: int = 1024):
+        self.feed = feed
+        self.strategies = strategies
+        self.broker = broker or SimulatedBroker()
+        self.units = units
+        self.queue_size = queue_size
+        self.signals = defaultdict(list)
+        self.latencies = {stage: [] for stage in self.STAGES}
+        self.bars = 0
+        self.elapsed = 0.0
+        self.strategies_by_symbol = {}
+
+    def _strategy(self, symbol: str):
+        if isinstance(self.strategies, dict):
+            return self.strategies[symbol]
+        strategy = self.strategies(symbol)
+        self.strategies_by_symbol[symbol] = strategy
+        return strategy
+
+    async def _worker(self, symbol: str, queue: asyncio.Queue):
+        strategy = self._strategy(symbol)
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            bar, queued_at = item
+            started = time.perf_counter_ns()
+            self.broker.on_bar(bar)
+            filled = time.perf_counter_ns()
+            signal = strategy.on_bar(bar)
+            decided = time.perf_counter_ns()
+            self.broker.submit(symbol, signal * self.units, bar.timestamp)
+            done = time.perf_counter_ns()
+
+            self.signals[symbol].append((bar.timestamp, signal))
+            self.latencies['queue'].append(started - queued_at)
+            self.latencies['strategy'].append(decided - filled)
+            self.latencies['broker'].append((filled - started) + (done - decided))
+            self.latencies['total'].append(done - queued_at)
+            self.bars += 1
+
+    async def run(self) -> dict:
+        # A worker that raises (in on_bar or the strategy lookup) stops the feed and cancels the
+        # other workers, and its exception is re-raised here instead of blocking on a full queue.
+        queues = {}
+        workers = {}
+        started = time.perf_counter()
+        stream = self.feed.stream()
+        try:
+            async for bar in stream:
+                if bar.symbol not in queues:
+                    queues[bar.symbol] = asyncio.Queue(self.queue_size)
+                    workers[bar.symbol] = asyncio.create_task(self._worker(bar.symbol, queues[bar.symbol]))
+                await self._put(queues[bar.symbol], workers[bar.symbol], (bar, time.perf_counter_ns()))
+            for symbol, queue in queues.items():
+                await self._put(queue, workers[symbol], None)
+            await asyncio.gather(*workers.values())
+        finally:
+            for worker in workers.values():
+                worker.cancel()
+            await asyncio.gather(*workers.values(), return_exceptions=True)
+            await stream.aclose()
+        self.elapsed = time.perf_counter() - started
+        return self.report()
+
+    @staticmethod
+    async def _put(queue: asyncio.Queue, worker: asyncio.Task, item):
+        if not worker.done() and not queue.full():
+            queue.put_nowait(item)
+            return
+        put = asyncio.ensure_future(queue.put(item))
+        await asyncio.wait([put, worker], return_when=asyncio.FIRST_COMPLETED)
+        if put.done():
+            return
+        put.cancel()
+        # The worker finished without taking the item, so it raised (or was cancelled).
+        if worker.cancelled():
+            raise asyncio.CancelledError()
+        raise worker.exception() or RuntimeError("worker stopped before the feed ended")
+
+    def run_sync(self) -> dict:
+        return asyncio.run(self.run())
+
+    def report(self) -> dict:
+        # Throughput plus mean / p50 / p99 latency per stage, in microseconds.
+        report = {
+            'bars': self.bars,
+            'symbols': len(self.signals),
+            'seconds': self.elapsed,
+            'bars_per_sec': self.bars / self.elapsed if self.elapsed else float('nan'),
+            'equity': self.broker.equity(),
+            'fills': len(self.broker.fills),
+        }
+        for stage, samples in self.latencies.items():
+            if samples:
+                us = np.asarray(samples) / 1e3
+                report[f'{stage}_us_mean'] = float(us.mean())
+                report[f'{stage}_us_p50'] = float(np.percentile(us, 50))
+                report[f'{stage}_us_p99'] = float(np.percentile(us, 99))
+        return report
+
+    def signal_frame(self) -> pd.DataFrame:
+        # (time x symbols) signals emitted so far.
+        return pd.DataFrame({s: pd.Series(dict(v)) for s, v in self.signals.items()})
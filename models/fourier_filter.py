@@ -1,20 +1,156 @@
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
 
+from utils.instrumentation import timed
+
 class FourierFilter:
     def __init__(self, keep_ratio=0.05):
         self.keep_ratio = keep_ratio
 
-    def apply(self, series: pd.Series) -> pd.Series:
-        series = series.squeeze()
-        n = len(series)
-        fft = np.fft.fft(series.values)
-        freqs = np.fft.fftfreq(n)
-        fft_filtered = np.copy(fft)
-        cutoff = int(n * self.keep_ratio)
-        indices = np.argsort(np.abs(freqs))
-        mask = np.zeros(n, dtype=bool)
-        mask[indices[:cutoff]] = True
-        fft_filtered[~mask] = 0
-        smoothed = np.fft.ifft(fft_filtered).real
+    @timed('filter.fourier')
+    def apply(self, series):
+        if isinstance(series, pd.DataFrame) and series.shape[1] == 1:
+            series = series.iloc[:, 0]
+
+        smoothed = self.apply_array(series.to_numpy(dtype=float))
+
+        if isinstance(series, pd.DataFrame):
+            return pd.DataFrame(smoothed, index=series.index, columns=series.columns)
         return pd.Series(smoothed, index=series.index)
+
+    def apply_array(self, values: np.ndarray) -> np.ndarray:
+        # Low-pass of a 1-D series or of each column of a (time x tickers) panel.
+        values = np.asarray(values, dtype=float)
+        n = len(values)
+        if n == 0:
+            return values.copy()
+        weights = _rfft_weights(n, self.keep_ratio).reshape((-1,) + (1,) * (values.ndim - 1))
+        return np.fft.irfft(np.fft.rfft(values, axis=0) * weights, n=n, axis=0)
+
+    @timed('filter.fourier_rolling')
+    def rolling_apply(self, series, windows):
+        # Causal mode: the value at bar t is the low-pass of the `window` bars ending at t, so it never
+        # looks ahead; bars before a full window are NaN. Each window is a fixed FIR filter on a
+        # strided view of the series, and a list of windows is evaluated in one matrix product.
+        # A list of windows gives one column per window (per (window, ticker) for panels).
+        single = np.ndim(windows) == 0
+        windows = [int(windows)] if single else [int(w) for w in windows]
+        if isinstance(series, pd.DataFrame) and series.shape[1] == 1:
+            series = series.iloc[:, 0]
+        values = series.to_numpy(dtype=float)
+        n, longest = len(values), max(windows)
+
+        # Coefficients aligned to the end of the longest window, one column per window length.
+        coefficients = np.zeros((longest, len(windows)))
+        for k, window in enumerate(windows):
+            coefficients[longest - window:, k] = _causal_coefficients(window, self.keep_ratio)
+
+        padded = np.concatenate([np.zeros((longest - 1,) + values.shape[1:]), values])
+        view = np.lib.stride_tricks.sliding_window_view(padded, longest, axis=0)  # (n, [tickers,] longest)
+        smoothed = view @ coefficients  # (n, [tickers,] windows)
+        for k, window in enumerate(windows):
+            smoothed[:window - 1, ..., k] = np.nan
+
+        if isinstance(series, pd.DataFrame):
+            columns = pd.MultiIndex.from_product([windows, series.columns], names=['window', None])
+            frame = pd.DataFrame(np.moveaxis(smoothed, -1, 1).reshape(n, -1), index=series.index, columns=columns)
+            return frame[windows[0]] if single else frame
+        if single:
+            return pd.Series(smoothed[:, 0], index=series.index)
+        return pd.DataFrame(smoothed, index=series.index, columns=windows)
+
+
+@lru_cache(maxsize=256)
+def _rfft_weights(n: int, keep_ratio: float) -> np.ndarray:
+    # The kept frequencies are the `cutoff` smallest |f| of the full FFT. In rfft terms a bin whose
+    # negative twin is dropped contributes half, which is what taking the real part of the ifft does.
+    freqs = np.fft.fftfreq(n)
+    cutoff = int(n * keep_ratio)
+    indices = np.argsort(np.abs(freqs))
+    mask = np.zeros(n, dtype=bool)
+    mask[indices[:cutoff]] = True
+
+    k = np.arange(n // 2 + 1)
+    weights = (mask[k].astype(float) + mask[(n - k) % n]) / 2
+    weights.flags.writeable = False
+    return weights
+
+
+@lru_cache(maxsize=256)
+def _causal_coefficients(window: int, keep_ratio: float) -> np.ndarray:
+    # Weights h such that h @ x is the last sample of the low-passed window x.
+    impulse = np.fft.irfft(_rfft_weights(window, keep_ratio)[:, None] * np.fft.rfft(np.eye(window), axis=0),
+                           n=window, axis=0)
+    coefficients = impulse[-1].copy()
+    coefficients.flags.writeable = False
+    return coefficients
+
+
+class SlidingFourierFilter:
+    # Causal low-pass over the last `window` bars, updated with a sliding DFT: each bar costs O(k)
+    # for the k kept frequencies instead of an FFT over the whole history. The smoothed value is the
+    # low-pass reconstruction of the newest sample in the window.
+    def __init__(self, window=256, keep_ratio=0.05):
+        self.window = window
+        self.keep_ratio = keep_ratio
+        # Same kept frequencies as FourierFilter over one window (including the half weight of a bin
+        # whose twin is dropped), so update() matches rolling_apply(window) once the window is full.
+        kept = _rfft_weights(window, keep_ratio)
+        nonzero = np.flatnonzero(kept)
+        self.num_freqs = nonzero[-1] + 1 if len(nonzero) else 1
+        freqs = np.arange(self.num_freqs)
+        self.twiddle = np.exp(2j * np.pi * freqs / window)
+        # Weights of X_0..X_m in the inverse DFT at the newest sample, folding in the conjugate bins
+        # (all but DC and Nyquist appear twice in the full spectrum).
+        fold = np.where((freqs == 0) | (2 * freqs == window), 1.0, 2.0)
+        self.weights = fold * kept[:self.num_freqs] * np.conj(self.twiddle) / window
+        self.buffer = None
+        self.spectrum = None
+        self.pos = 0
+        self.count = 0
+
+    def update(self, bar):
+        bar = np.asarray(bar, dtype=float)
+        if self.buffer is None:
+            # Warm up as if the first bar had been seen for the whole window.
+            self.buffer = np.repeat(bar[None, ...], self.window, axis=0)
+            self.pos = 0
+            self._resync()
+        else:
+            oldest = self.buffer[self.pos]
+            delta = bar - oldest
+            self.buffer[self.pos] = bar
+            self.pos = (self.pos + 1) % self.window
+            twiddle = self.twiddle.reshape((-1,) + (1,) * bar.ndim)
+            self.spectrum = (self.spectrum + delta) * twiddle
+            if self.pos == 0:
+                # Recompute exactly once per window so rounding errors of the recurrence cannot build up.
+                self._resync()
+        self.count += 1
+        weights = self.weights.reshape((-1,) + (1,) * bar.ndim)
+        smoothed = np.sum(weights * self.spectrum, axis=0).real
+        return smoothed.item() if smoothed.ndim == 0 else smoothed
+
+    def _resync(self):
+        ordered = np.roll(self.buffer, -self.pos, axis=0)
+        self.spectrum = np.fft.rfft(ordered, axis=0)[:self.num_freqs]
+
+    def snapshot(self) -> dict:
+        return {
+            'window': self.window,
+            'keep_ratio': self.keep_ratio,
+            'buffer': None if self.buffer is None else self.buffer.copy(),
+            'pos': self.pos,
+            'count': self.count,
+        }
+
+    def restore(self, state: dict):
+        self.__init__(window=state['window'], keep_ratio=state['keep_ratio'])
+        if state['buffer'] is not None:
+            self.buffer = np.array(state['buffer'], dtype=float)
+            self.pos = state['pos']
+            self._resync()
+        self.count = state['count']
+        return self
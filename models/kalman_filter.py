@@ -1,6 +1,8 @@
 import numpy as np
 import pandas as pd
 
+from utils.instrumentation import timed
+
 class KalmanFilter:
     def __init__(self, R=0.01, Q=1e-5):
         self.R = R
@@ -8,25 +10,171 @@ class KalmanFilter:
         self.A = 1
         self.H = 1
 
-    def apply(self, series: pd.Series) -> pd.Series:
-        n = len(series)
-        xhat = np.zeros(n)
-        P = np.zeros(n)
-        xhatminus = np.zeros(n)
-        Pminus = np.zeros(n)
+    @timed('filter.kalman')
+    def apply(self, series):
+        if isinstance(series, pd.DataFrame) and series.shape[1] == 1:
+            series = series.iloc[:, 0]
+
+        smoothed = self.apply_array(series.to_numpy(dtype=float))
+
+        if isinstance(series, pd.DataFrame):
+            return pd.DataFrame(smoothed, index=series.index, columns=series.columns)
+        return pd.Series(smoothed, index=series.index)
+
+    def apply_array(self, values: np.ndarray) -> np.ndarray:
+        # Filters a 1-D series or a (time x tickers) panel, one ticker per column.
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return values.copy()
+        panel = values.reshape(len(values), -1)
+        n = panel.shape[0]
+
+        # The gain does not depend on the observations, so it is shared by every column.
+        K, _ = self.gain_sequence(n)
+        decay = (1 - K * self.H) * self.A
+        xhat = _affine_scan(decay, K[:, None] * panel, panel[0])
+        return xhat.reshape(values.shape)
+
+    def gain_sequence(self, n: int, P: float = 1.0):
+        # Gains for steps 1..n-1 starting from covariance P at step 0; also returns the final P.
+        #
+        # One step maps P to f(P) = R * (A^2 P + Q) / (H^2 (A^2 P + Q) + R), a Mobius map, so m steps
+        # are the 2x2 matrix power M^m applied to P. The covariances are filled in doubling chunks,
+        # P[m:2m] = f^m(P[:m]), which takes log2(n) vectorized steps however slowly P converges.
         K = np.zeros(n)
+        if n < 2:
+            return K, P
+        A2, H2 = self.A * self.A, self.H * self.H
+        M = np.array([[self.R * A2, self.R * self.Q], [H2 * A2, H2 * self.Q + self.R]], dtype=float)
+        covariance = np.empty(n)
+        covariance[0] = P
+        m = 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            while m < n:
+                prev = covariance[:min(m, n - m)]
+                covariance[m:m + len(prev)] = (M[0, 0] * prev + M[0, 1]) / (M[1, 0] * prev + M[1, 1])
+                M = M @ M
+                scale = np.abs(M).max()
+                if scale > 0:
+                    M /= scale  # only the ratio matters; this keeps the powers from overflowing
+                m *= 2
+            Pminus = A2 * covariance[:-1] + self.Q
+            K[1:] = Pminus * self.H / (H2 * Pminus + self.R)
+        return K, covariance[-1]
+
+
+def _affine_scan(a: np.ndarray, u: np.ndarray, x0: np.ndarray,
+                 min_scale: float = 1e-8, max_block: int = 4096, min_work: int = 2048) -> np.ndarray:
+    # Solves x[k] = a[k] * x[k-1] + u[k] with x[0] = x0 along axis 0, one block of steps at a time.
+    # Within a block x[k] = C[k] * (x[start-1] + cumsum(u / C)), where C is the running product of a;
+    # blocks end before C leaves [min_scale, 1 / min_scale] so the division stays well conditioned.
+    n = len(a)
+    x = np.empty_like(u)
+    x[0] = x0
+    limit = -np.log(min_scale)
+    # |a| below `small` gives blocks of fewer than min_work elements (steps x columns), too little
+    # work to pay for a Python iteration each.
+    width = int(np.prod(u.shape[1:]))
+    small = min_scale ** (min(width / min_work, 1.0))
+
+    start = 1
+    while start < n:
+        if abs(a[start]) < small:
+            # Steps that forget the past quickly (mid-range or large gains) would give short blocks,
+            # so runs of them are solved with a log-step scan, whose cost barely depends on a.
+            fast = np.abs(a[start:start + 16 * max_block]) < small
+            end = start + (int(np.argmin(fast)) if not fast.all() else len(fast))
+            x[start:end] = _doubling_scan(a[start:end], u[start:end], x[start - 1])
+            start = end
+            continue
+
+        with np.errstate(divide='ignore'):
+            log_scale = np.abs(np.cumsum(np.log(np.abs(a[start:start + max_block]))))
+        out_of_range = log_scale > limit
+        length = int(np.argmax(out_of_range)) if out_of_range.any() else len(log_scale)
+        if length == 0:
+            x[start] = a[start] * x[start - 1] + u[start]
+            start += 1
+            continue
+
+        end = start + length
+        C = np.cumprod(a[start:end])[:, None]
+        x[start:end] = C * (x[start - 1] + np.cumsum(u[start:end] / C, axis=0))
+        start = end
+    return x
+
+
+def _doubling_scan(a: np.ndarray, u: np.ndarray, x_prev: np.ndarray) -> np.ndarray:
+    # Recursive doubling for x[k] = a[k] * x[k-1] + u[k] with |a| < 1: after the pass with stride d,
+    # y[k] holds the sum over the last 2d steps and C[k] the product of their a's. Passes stop once
+    # every remaining C is below rounding, so the count is about log2(log(eps) / log(max |a|)).
+    y = u.copy()
+    y[0] += a[0] * x_prev
+    C = a.astype(float)
+    C[0] = 0.0
+    shape = (-1,) + (1,) * (u.ndim - 1)
+    d = 1
+    while d < len(y) and np.abs(C[d:]).max() > 1e-19:
+        y[d:] += C[d:].reshape(shape) * y[:-d]
+        C[d:] *= C[:-d].copy()
+        d *= 2
+    return y
+
+
+class OnlineKalmanFilter(KalmanFilter):
+    # Bar-by-bar version of KalmanFilter.apply: carries xhat and P forward, so each bar costs O(1).
+    def __init__(self, R=0.01, Q=1e-5):
+        super().__init__(R=R, Q=Q)
+        self.xhat = None
+        self.P = 1.0
+        self.count = 0
+
+    def update(self, bar):
+        # A bar may be a scalar or an array with one price per ticker; P is shared since it is data independent.
+        bar = np.asarray(bar, dtype=float)
+        if self.xhat is None:
+            self.xhat = bar.copy()
+            self.P = 1.0
+        else:
+            xhatminus = self.A * self.xhat
+            Pminus = self.A * self.P * self.A + self.Q
+            K = Pminus * self.H / (self.H * Pminus * self.H + self.R)
+            self.xhat = xhatminus + K * (bar - self.H * xhatminus)
+            self.P = (1 - K * self.H) * Pminus
+        self.count += 1
+        return self.xhat.item() if self.xhat.ndim == 0 else self.xhat.copy()
+
+    def update_many(self, values: np.ndarray) -> np.ndarray:
+        # Filters a chunk of bars (time first) in one vectorized pass, continuing from the current state.
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return values.copy()
+        panel = values.reshape(len(values), -1)
+        resume = self.xhat is not None
+        if resume:
+            panel = np.vstack([self.xhat.reshape(1, -1), panel])
 
-        xhat[0] = float(series.iloc[0].item()) if hasattr(series.iloc[0], 'item') else float(series.iloc[0])
-        P[0] = 1.0
+        K, self.P = self.gain_sequence(len(panel), self.P if resume else 1.0)
+        xhat = _affine_scan((1 - K * self.H) * self.A, K[:, None] * panel, panel[0])
+        if resume:
+            xhat = xhat[1:]
+        self.xhat = xhat[-1].reshape(values.shape[1:])
+        self.count += len(values)
+        return xhat.reshape(values.shape)
 
-        for k in range(1, n):
-            xhatminus[k] = self.A * xhat[k - 1]
-            Pminus[k] = self.A * P[k - 1] * self.A + self.Q
-            innovation = series.iloc[k] - self.H * xhatminus[k]
-            if hasattr(innovation, 'item'):
-                innovation = float(innovation.item())
-            K[k] = Pminus[k] * self.H / (self.H * Pminus[k] * self.H + self.R)
-            xhat[k] = xhatminus[k] + K[k] * innovation
-            P[k] = (1 - K[k] * self.H) * Pminus[k]
+    def snapshot(self) -> dict:
+        return {
+            'R': self.R,
+            'Q': self.Q,
+            'xhat': None if self.xhat is None else self.xhat.copy(),
+            'P': self.P,
+            'count': self.count,
+        }
 
-        return pd.Series(xhat, index=series.index)
+    def restore(self, state: dict):
+        self.R = state['R']
+        self.Q = state['Q']
+        self.xhat = None if state['xhat'] is None else np.array(state['xhat'], dtype=float)
+        self.P = state['P']
+        self.count = state['count']
+        return self
@@ -1,21 +1,106 @@
+from collections import deque
+
 import numpy as np
-from collections import Counter
+
+from utils.instrumentation import timed
 
 class MarkovChainModel:
     def __init__(self, num_states=3):
         self.num_states = num_states
         self.transition_matrix = np.zeros((num_states, num_states))
 
+    @timed('fit.markov')
     def fit(self, state_series):
-        counts = Counter()
-        for (i, j) in zip(state_series[:-1], state_series[1:]):
-            counts[(i, j)] += 1
-
-        for i in range(self.num_states):
-            row_total = sum(counts[(i, k)] for k in range(self.num_states))
-            for j in range(self.num_states):
-                self.transition_matrix[i][j] = counts[(i, j)] / row_total if row_total > 0 else 0
+        states = np.asarray(state_series, dtype=np.int64)
+        counts = np.bincount(states[:-1] * self.num_states + states[1:],
+                             minlength=self.num_states ** 2).reshape(self.num_states, self.num_states)
+        row_total = counts.sum(axis=1, keepdims=True)
+        self.transition_matrix = np.divide(counts, row_total, out=np.zeros(counts.shape), where=row_total > 0)
 
     def predict_next_state(self, current_state):
         probs = self.transition_matrix[current_state]
         return np.random.choice(self.num_states, p=probs)
+
+
+class RollingMarkovChainModel(MarkovChainModel):
+    # Transition estimate maintained state by state in O(1): either over the last `window`
+    # transitions, or with every past transition down-weighted by `decay` per step.
+    def __init__(self, num_states=3, window=None, decay=None):
+        if (window is None) == (decay is None):
+            raise ValueError("Specify exactly one of window or decay")
+        super().__init__(num_states)
+        self.window = window
+        self.decay = decay
+        self.counts = np.zeros((num_states, num_states))
+        self.row_totals = np.zeros(num_states)
+        self.weight = 1.0
+        self.last_state = None
+        self.recent = deque()
+
+    @timed('fit.markov_rolling')
+    def fit(self, state_series):
+        self.__init__(self.num_states, window=self.window, decay=self.decay)
+        for state in np.asarray(state_series, dtype=np.int64).tolist():
+            self.update(state)
+
+    def update(self, state: int):
+        state = int(state)
+        if self.last_state is not None:
+            i, j = self.last_state, state
+            if self.decay is None:
+                self.recent.append((i, j))
+                self.counts[i, j] += 1
+                self.row_totals[i] += 1
+                if len(self.recent) > self.window:
+                    old_i, old_j = self.recent.popleft()
+                    self.counts[old_i, old_j] -= 1
+                    self.row_totals[old_i] -= 1
+                    self._renormalize(old_i)
+            else:
+                # Instead of multiplying every count by `decay`, new transitions get weight decay**-t;
+                # the common scale cancels in the ratios and is folded back in before it overflows.
+                self.weight /= self.decay
+                self.counts[i, j] += self.weight
+                self.row_totals[i] += self.weight
+                if self.weight > 1e100:
+                    self.counts /= self.weight
+                    self.row_totals /= self.weight
+                    self.weight = 1.0
+            self._renormalize(i)
+        self.last_state = state
+
+    def _renormalize(self, row: int):
+        # Only the touched row changes, so the matrix stays current at O(num_states) per update.
+        total = self.row_totals[row]
+        self.transition_matrix[row] = self.counts[row] / total if total > 0 else 0.0
+
+
+def evaluate_windows(states, windows, num_states=3) -> dict:
+    # Scores rolling-window transition estimates for several window lengths over a batch of series.
+    # states is (series x time); each transition k is predicted from the `w` transitions before it.
+    # Returns (len(windows) x series) arrays of the mean log-likelihood of the observed next state
+    # and the hit rate of the most likely one, over transitions whose history row was non-empty.
+    states = np.atleast_2d(np.asarray(states, dtype=np.int64))
+    S = num_states
+    prev, nxt = states[:, :-1], states[:, 1:]
+    K = prev.shape[1]
+
+    # cumulative[:, k] holds the counts of transitions 0..k-1.
+    cumulative = np.zeros((states.shape[0], K + 1, S * S))
+    cumulative[:, 1:] = np.cumsum(prev[..., None] * S + nxt[..., None] == np.arange(S * S), axis=1)
+    row_columns = prev[..., None] * S + np.arange(S)
+    end = cumulative[:, :K]
+
+    log_likelihood = np.empty((len(windows), states.shape[0]))
+    hit_rate = np.empty_like(log_likelihood)
+    for w, window in enumerate(windows):
+        start = cumulative[:, np.maximum(np.arange(K) - window, 0)]
+        rows = np.take_along_axis(end, row_columns, axis=2) - np.take_along_axis(start, row_columns, axis=2)
+        totals = rows.sum(axis=2)
+        seen = totals > 0
+        observed = np.take_along_axis(rows, nxt[..., None], axis=2)[..., 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ll = np.log(np.maximum(observed / totals, 1e-12))
+            log_likelihood[w] = np.nansum(np.where(seen, ll, np.nan), axis=1) / seen.sum(axis=1)
+            hit_rate[w] = np.sum(seen & (rows.argmax(axis=2) == nxt), axis=1) / seen.sum(axis=1)
+    return {'log_likelihood': log_likelihood, 'hit_rate': hit_rate}
@@ -0,0 +1,208 @@
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from backtester import Backtester, compute_metrics
+from models.fourier_filter import FourierFilter
+from models.kalman_filter import KalmanFilter
+from strategies.fourier_strategy import FourierCycleStrategy
+from strategies.kalman_strategy import KalmanTrendStrategy
+from strategies.meta_strategy import MetaStrategy
+from utils.shared_frame import SharedFrame, attach_frame
+
+
+def evaluate_meta_strategy(data: pd.DataFrame, params: dict) -> dict:
+    # Default objective: Kalman + Fourier filters feeding a two-strategy MetaStrategy.
+    data = data.copy()
+    data['kalman'] = KalmanFilter(R=params.get('R', 0.01), Q=params.get('Q', 1e-5)).apply(data['close'])
+    data['fourier'] = FourierFilter(keep_ratio=params.get('keep_ratio', 0.05)).apply(data['close'])
+
+    kalman_weight = params.get('kalman_weight', 0.5)
+    meta = MetaStrategy(
+        strategies=[
+            KalmanTrendStrategy(data, slope_threshold=params.get('slope_threshold', 0.001)),
+            FourierCycleStrategy(data, threshold=params.get('fourier_threshold', 0.01)),
+        ],
+        weights=[kalman_weight, 1 - kalman_weight],
+    )
+    portfolio = Backtester(data, meta).run()
+    return compute_metrics(portfolio)
+
+
+# ----- parameter spaces -----
+
+def grid_search(param_grid: dict) -> list:
+    keys = list(param_grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(param_grid[k] for k in keys))]
+
+
+def _sample(spec, rng):
+    # A list/array is a set of choices, a (low, high) tuple is a uniform range.
+    if isinstance(spec, tuple):
+        low, high = spec
+        return float(rng.uniform(low, high))
+    return spec[int(rng.integers(len(spec)))]
+
+
+def random_search(param_space: dict, n_iter: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    return [{k: _sample(spec, rng) for k, spec in param_space.items()} for _ in range(n_iter)]
+
+
+_WORKER = {}
+
+
+def _init_worker(frame_spec, evaluate):
+    # Keep the shared memory mappings alive for the worker's lifetime.
+    _WORKER['blocks'], _WORKER['data'] = attach_frame(frame_spec)
+    _WORKER['evaluate'] = evaluate
+
+
+def _run_task(task_id, params, start, stop, seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    data = _WORKER['data'].iloc[start:stop]
+    try:
+        metrics = _WORKER['evaluate'](data, params)
+    except Exception as e:
+        print(f"[optimizer] task {task_id} failed for {params}: {e}")
+        metrics = {}
+    return task_id, metrics
+
+
+# ----- optimizer -----
+
+class Optimizer:
+    def __init__(self, data: pd.DataFrame, evaluate=evaluate_meta_strategy, rank_by: str = 'Sharpe Ratio',
+                 max_workers: int = None, seed: int = 0, progress: bool = True):
+        self.data = data
+        self.evaluate = evaluate
+        self.rank_by = rank_by
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.seed = seed
+        self.progress = progress
+
+    def _evaluate_many(self, jobs: list) -> list:
+        # jobs: list of (params, start, stop); returns the metrics in job order.
+        seeds = np.random.SeedSequence(self.seed).generate_state(max(len(jobs), 1))
+        tasks = [(i, params, start, stop, int(seeds[i])) for i, (params, start, stop) in enumerate(jobs)]
+        results = [None] * len(tasks)
+        started = time.perf_counter()
+
+        with SharedFrame(self.data) as frame:
+            if self.max_workers == 1:
+                _init_worker(frame.spec(), self.evaluate)
+                completed = (_run_task(*task) for task in tasks)
+                self._collect(completed, results, started)
+                _WORKER.clear()
+            else:
+                with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                         initargs=(frame.spec(), self.evaluate)) as pool:
+                    futures = [pool.submit(_run_task, *task) for task in tasks]
+                    self._collect((f.result() for f in as_completed(futures)), results, started)
+        return results
+
+    def _collect(self, completed, results, started):
+        total = len(results)
+        step = max(total // 20, 1)
+        for done, (task_id, metrics) in enumerate(completed, start=1):
+            results[task_id] = metrics
+            if self.progress and (done % step == 0 or done == total):
+                elapsed = time.perf_counter() - started
+                print(f"[optimizer] {done}/{total} evaluations ({elapsed:.1f}s)")
+
+    def _table(self, param_sets: list, metrics: list) -> pd.DataFrame:
+        return self._rank(pd.DataFrame([{**p, **m} for p, m in zip(param_sets, metrics)]))
+
+    def _rank(self, table: pd.DataFrame) -> pd.DataFrame:
+        if self.rank_by in table.columns:
+            table = table.sort_values(self.rank_by, ascending=False, kind='mergesort')
+        return table.reset_index(drop=True)
+
+    def search(self, param_sets: list, start: int = 0, stop: int = None) -> pd.DataFrame:
+        stop = len(self.data) if stop is None else stop
+        metrics = self._evaluate_many([(p, start, stop) for p in param_sets])
+        return self._table(param_sets, metrics)
+
+    def grid_search(self, param_grid: dict) -> pd.DataFrame:
+        return self.search(grid_search(param_grid))
+
+    def random_search(self, param_space: dict, n_iter: int = 100) -> pd.DataFrame:
+        return self.search(random_search(param_space, n_iter, seed=self.seed))
+
+    def adaptive_search(self, param_space: dict, n_iter: int = 100, batch_size: int = 20,
+                        elite_frac: float = 0.2) -> pd.DataFrame:
+        # Sequential model-based search (cross-entropy style): each batch is sampled from the
+        # distribution of the best `elite_frac` results so far, narrowing in on good regions.
+        rng = np.random.default_rng(self.seed)
+        tables = []
+        evaluated = 0
+        while evaluated < n_iter:
+            size = min(batch_size, n_iter - evaluated)
+            history = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+            # Failed evaluations have no metrics; until some succeed, keep sampling at random.
+            if self.rank_by in history.columns:
+                history = history.dropna(subset=[self.rank_by])
+            if self.rank_by not in history.columns or history.empty:
+                batch = random_search(param_space, size, seed=int(rng.integers(2**32)))
+            else:
+                elite = history.nlargest(max(int(len(history) * elite_frac), 1), self.rank_by)
+                batch = [self._sample_near(param_space, elite, rng) for _ in range(size)]
+            tables.append(self.search(batch))
+            evaluated += size
+        return self._rank(pd.concat(tables, ignore_index=True))
+
+    def _sample_near(self, param_space: dict, elite: pd.DataFrame, rng) -> dict:
+        params = {}
+        for k, spec in param_space.items():
+            if isinstance(spec, tuple):
+                low, high = spec
+                std = elite[k].std(ddof=0) if len(elite) > 1 else (high - low) / 4
+                value = rng.normal(elite[k].mean(), max(std, (high - low) * 1e-3))
+                params[k] = float(np.clip(value, low, high))
+            else:
+                params[k] = elite[k].iloc[int(rng.integers(len(elite)))]
+        return params
+
+    def walk_forward(self, param_sets: list, train_size: int, test_size: int, step: int = None) -> pd.DataFrame:
+        # Rolling train/test evaluation: pick the best parameter set on each training window and
+        # report its out-of-sample metrics on the window that follows. A window where no training
+        # evaluation produced a score is not tested; its row only carries an 'error'.
+        step = step or test_size
+        windows = [(start, start + train_size, start + train_size + test_size)
+                   for start in range(0, len(self.data) - train_size - test_size + 1, step)]
+
+        train_jobs = [(p, start, mid) for start, mid, _ in windows for p in param_sets]
+        train_metrics = self._evaluate_many(train_jobs)
+
+        best = []
+        for w in range(len(windows)):
+            scores = [m.get(self.rank_by, np.nan) for m in train_metrics[w * len(param_sets):(w + 1) * len(param_sets)]]
+            scores = np.asarray(scores, dtype=float)
+            if np.isnan(scores).all():
+                best.append(None)
+                continue
+            best.append(param_sets[int(np.argmax(np.nan_to_num(scores, nan=-np.inf)))])
+
+        selected = [w for w, params in enumerate(best) if params is not None]
+        test_metrics = dict(zip(selected, self._evaluate_many(
+            [(best[w], windows[w][1], windows[w][2]) for w in selected])))
+
+        rows = []
+        for w, ((start, mid, end), params) in enumerate(zip(windows, best)):
+            row = {
+                'train_start': self.data.index[start],
+                'test_start': self.data.index[mid],
+                'test_end': self.data.index[end - 1],
+            }
+            if params is None:
+                row['error'] = f"no training evaluation produced '{self.rank_by}'"
+            else:
+                row.update({**params, **test_metrics[w]})
+            rows.append(row)
+        return pd.DataFrame(rows)
@@ -1,5 +1,23 @@
+import numpy as np
 import pandas as pd
 
 class BaseStrategy:
+    # Whether signals may draw from the global `random` / `np.random` state. The order of those
+    # draws matters, so MetaStrategy only runs children concurrently when they set this to False;
+    # subclasses opt in once they are known to be deterministic.
+    uses_random = True
+
     def generate_signals(self, data: pd.DataFrame) -> pd.Series:
-        raise NotImplementedError("Must implement generate_signals method")
\ No newline at end of file
+        raise NotImplementedError("Must implement generate_signals method")
+
+
+def threshold_signals(values, threshold: float, above: int = 1, below: int = -1):
+    # `above` where values > threshold, `below` where values < -threshold, 0 otherwise. A Series gives
+    # a Series and a (time x tickers) DataFrame gives a DataFrame of signals.
+    array = values.to_numpy() if isinstance(values, (pd.Series, pd.DataFrame)) else np.asarray(values)
+    signals = np.select([array > threshold, array < -threshold], [above, below], 0)
+    if isinstance(values, pd.DataFrame):
+        return pd.DataFrame(signals, index=values.index, columns=values.columns)
+    if isinstance(values, pd.Series):
+        return pd.Series(signals, index=values.index)
+    return signals
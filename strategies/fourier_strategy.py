@@ -2,41 +2,48 @@
 
 import pandas as pd
 import numpy as np
-from strategies.base_strategy import BaseStrategy
+from strategies.base_strategy import BaseStrategy, threshold_signals
+from utils.instrumentation import timed
 
 class FourierCycleStrategy(BaseStrategy):
-    def __init__(self, data: pd.DataFrame, threshold: float = 0.01):
+    uses_random = False
+
+    def __init__(self, data: pd.DataFrame, threshold: float = 0.01, features=None):
         self.data = data
         self.threshold = threshold
+        self.features = features
 
+    @timed('signals.fourier')
     def generate_signals(self, data: pd.DataFrame) -> pd.Series:
-        try:
-            close = self.data['close']
-            if isinstance(close, pd.DataFrame):
-                close = close.squeeze()
-
-            if not isinstance(close, pd.Series):
-                raise TypeError(f"'close' must be a Series, got {type(close)}")
-
-            close = pd.to_numeric(close, errors='coerce')
+        if self.features is not None:
+            residual = self.features.get(self.data, 'cycle_residual').fillna(0)
+            signals = threshold_signals(residual, self.threshold, above=-1, below=1)
+            signals.index = self.data.index
+            return signals
 
-            fourier = pd.to_numeric(self.data['fourier'], errors='coerce')
+        try:
+            close = _numeric(self.data['close'])
+            fourier = _numeric(self.data['fourier'])
         except Exception as e:
             print("[ERROR] FourierStrategy input conversion failed:", e)
             raise
 
-        residual = fourier - close
+        # A (time x tickers) 'fourier' panel yields one signal column per ticker.
+        residual = fourier.sub(close, axis=0) if isinstance(fourier, pd.DataFrame) else fourier - close
         residual = residual.fillna(0)
 
-        signals = []
-        for r in residual:
-            if isinstance(r, (pd.Timestamp, pd.Timedelta)):
-                signals.append(0)
-            elif r > self.threshold:
-                signals.append(-1)  # Price above cycle → sell
-            elif r < -self.threshold:
-                signals.append(1)   # Price below cycle → buy
-            else:
-                signals.append(0)
-
-        return pd.Series(signals, index=self.data.index)
+        # Price above cycle → sell, price below cycle → buy
+        signals = threshold_signals(residual, self.threshold, above=-1, below=1)
+        signals.index = self.data.index
+        return signals
+
+
+def _numeric(values):
+    if isinstance(values, pd.DataFrame):
+        if values.shape[1] == 1:
+            return pd.to_numeric(values.squeeze(axis=1), errors='coerce')
+        return values.apply(pd.to_numeric, errors='coerce')
+
+    if not isinstance(values, pd.Series):
+        raise TypeError(f"Expected a Series or DataFrame, got {type(values)}")
+    return pd.to_numeric(values, errors='coerce')
@@ -1,26 +1,27 @@
 import pandas as pd
 import numpy as np
-from strategies.base_strategy import BaseStrategy
+from strategies.base_strategy import BaseStrategy, threshold_signals
+from utils.instrumentation import timed
 
 class KalmanTrendStrategy(BaseStrategy):
-    def __init__(self, data: pd.DataFrame, slope_threshold: float = 0.001):
+    uses_random = False
+
+    def __init__(self, data: pd.DataFrame, slope_threshold: float = 0.001, features=None):
         self.data = data
         self.slope_threshold = slope_threshold
+        self.features = features
 
+    @timed('signals.kalman')
     def generate_signals(self, data: pd.DataFrame) -> pd.Series:
-        if 'kalman' not in self.data.columns:
+        # A (time x tickers) 'kalman' panel yields one signal column per ticker.
+        if self.features is not None:
+            slope = self.features.get(self.data, 'kalman_slope')
+        elif 'kalman' not in self.data.columns:
             raise ValueError("Data must include 'kalman' column")
+        else:
+            trend = self.data['kalman']
+            slope = trend.diff().fillna(0)
 
-        trend = self.data['kalman']
-        slope = trend.diff().fillna(0)
-
-        signals = []
-        for s in slope:
-            if s > self.slope_threshold:
-                signals.append(1)
-            elif s < -self.slope_threshold:
-                signals.append(-1)
-            else:
-                signals.append(0)
-
-        return pd.Series(signals, index=self.data.index)
+        signals = threshold_signals(slope, self.slope_threshold)
+        signals.index = self.data.index
+        return signals
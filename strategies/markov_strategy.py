@@ -1,41 +1,82 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from strategies.base_strategy import BaseStrategy
+from strategies.position_filters import StopFilter
+from utils.instrumentation import timed
+from utils.optional import pyplot, require
 
 class OrderNMarkovModel:
+    # Transition counts live in a dense (num_states**order x num_states) array. A history
+    # (s_1, ..., s_order) is row sum(s_k * num_states**(order - k)), i.e. its base-num_states number.
     def __init__(self, order=2, num_states=3):
         self.order = order
         self.num_states = num_states
-        self.transition_probs = {}
+        self.powers = num_states ** np.arange(order - 1, -1, -1, dtype=np.int64)
+        self.counts = np.zeros((num_states ** order, num_states), dtype=np.int64)
+        self.probs = np.zeros(self.counts.shape)
+        self._tail = np.zeros(0, dtype=np.int64)
 
-    def fit(self, state_series):
-        for i in range(len(state_series) - self.order):
-            history = tuple(state_series[i:i+self.order])
-            next_state = state_series[i + self.order]
-            if history not in self.transition_probs:
-                self.transition_probs[history] = [0] * self.num_states
-            self.transition_probs[history][next_state] += 1
+    def encode(self, histories) -> np.ndarray:
+        # Row index of each history in a (windows x order) array (only the last `order` columns are used).
+        histories = np.asarray(histories, dtype=np.int64)
+        return histories[..., histories.shape[-1] - self.order:] @ self.powers
 
-        for hist, counts in self.transition_probs.items():
-            total = sum(counts)
-            self.transition_probs[hist] = [c / total for c in counts]
+    @timed('fit.markov_order_n')
+    def fit(self, state_series):
+        self.counts[:] = 0
+        self._tail = np.zeros(0, dtype=np.int64)
+        self.partial_fit(state_series)
+
+    def partial_fit(self, state_series):
+        # Adds the transitions in state_series, including those spanning the end of the previous call.
+        states = np.concatenate([self._tail, np.asarray(state_series, dtype=np.int64)])
+        if len(states) > self.order:
+            codes = self.encode(np.lib.stride_tricks.sliding_window_view(states[:-1], self.order))
+            flat = codes * self.num_states + states[self.order:]
+            self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+            totals = self.counts.sum(axis=1, keepdims=True)
+            np.divide(self.counts, totals, out=self.probs, where=totals > 0)
+        self._tail = states[len(states) - self.order:] if self.order else states[:0]
+
+    @property
+    def transition_probs(self) -> dict:
+        # {history tuple: probabilities} for every history seen during fitting.
+        seen = np.flatnonzero(self.counts.sum(axis=1))
+        digits = (seen[:, None] // self.powers) % self.num_states
+        return {tuple(int(d) for d in h): self.probs[code].tolist() for h, code in zip(digits, seen)}
 
     def predict_next_state(self, current_history):
-        history = tuple(current_history[-self.order:])
-        probs = self.transition_probs.get(history)
-        if probs:
-            return np.random.choice(self.num_states, p=probs), max(probs)
+        code = int(self.encode(np.asarray(current_history[-self.order:])[None, :])[0])
+        if self.counts[code].any():
+            probs = self.probs[code]
+            return np.random.choice(self.num_states, p=probs), probs.max()
         return 1, 0.0  # default to 'flat' if unseen
 
+    def predict_batch(self, histories: np.ndarray):
+        # predict_next_state for each row of a (windows x order) array. Draws one uniform per seen
+        # history, in row order, exactly as the per-call np.random.choice would.
+        codes = self.encode(histories)
+        predicted = np.ones(len(codes), dtype=int)
+        confidence = np.zeros(len(codes))
+        seen = self.counts[codes].any(axis=1)
+        if seen.any():
+            probs = self.probs[codes[seen]]
+            cdf = np.cumsum(probs, axis=1)
+            cdf /= cdf[:, -1:]
+            draws = np.random.random_sample(len(probs))
+            predicted[seen] = (cdf <= draws[:, None]).sum(axis=1)
+            confidence[seen] = probs.max(axis=1)
+        return predicted, confidence
+
     def plot_transition_heatmap(self):
         matrix = {}
         for hist, probs in self.transition_probs.items():
             key = '→'.join(map(str, hist))
             matrix[key] = probs
 
-        df = pd.DataFrame.from_dict(matrix, orient='index', columns=['Down', 'Flat', 'Up'])
+        columns = ['Down', 'Flat', 'Up'] if self.num_states == 3 else list(range(self.num_states))
+        df = pd.DataFrame.from_dict(matrix, orient='index', columns=columns)
+        plt, sns = pyplot(), require('seaborn')
         plt.figure(figsize=(10, 6))
         sns.heatmap(df, annot=True, cmap='viridis', fmt=".2f")
         plt.title('Transition Probability Heatmap (Order-N)')
@@ -45,6 +86,8 @@ class OrderNMarkovModel:
         plt.show()
 
 class MarkovStrategy(BaseStrategy):
+    uses_random = True
+
     def __init__(self, markov_model, state_series: pd.Series, data: pd.DataFrame, 
                  prob_threshold: float = 0.6, capital: float = 10000):
         self.model = markov_model
@@ -54,60 +97,32 @@ class MarkovStrategy(BaseStrategy):
         self.capital = capital
         self.model.fit(state_series.tolist())
 
+    @timed('signals.markov')
     def generate_signals(self, data: pd.DataFrame) -> pd.Series:
-        signals = []
-
-        for i in range(self.model.order, len(self.state_series) - 1):
-            current_history = self.state_series.iloc[i - self.model.order:i].tolist()
-            predicted_state, confidence = self.model.predict_next_state(current_history)
-            current_state = current_history[-1]
-
-            if current_state == 0 and predicted_state == 2 and confidence > self.prob_threshold:
-                signals.append(1)
-            elif current_state == 2 and predicted_state == 0 and confidence > self.prob_threshold:
-                signals.append(-1)
-            else:
-                signals.append(0)
+        order = self.model.order
+        states = self.state_series.to_numpy()
+        signals = np.zeros(len(states), dtype=int)
+
+        if len(states) > order + 1:
+            # The history used at bar i is states[i - order:i], for i in [order, len - 1).
+            histories = np.lib.stride_tricks.sliding_window_view(states, order)[:len(states) - order - 1]
+            predicted, confidence = self.model.predict_batch(histories)
+            current = histories[:, -1]
+            confident = confidence > self.prob_threshold
+            signals[order:len(states) - 1] = np.select(
+                [(current == 0) & (predicted == 2) & confident, (current == 2) & (predicted == 0) & confident],
+                [1, -1], 0)
 
-        signals = [0] * self.model.order + signals + [0]
         signals = pd.Series(signals[:len(data)], index=data.index)
         signals = self.trailing_stop_filter(signals)
         return signals
 
     def trailing_stop_filter(self, signals: pd.Series, trailing_stop_pct: float = 0.03) -> pd.Series:
-        pos = 0
-        entry_price = 0
-        new_signals = []
-
-        for i, signal in enumerate(signals):
-            price = self.data['close'].iloc[i]
-
-            if signal == 1:
-                entry_price = price
-                pos = 1
-                new_signals.append(1)
-            elif signal == -1:
-                entry_price = price
-                pos = -1
-                new_signals.append(-1)
-            elif pos == 1:
-                if price < entry_price * (1 - trailing_stop_pct):
-                    new_signals.append(-1)
-                    pos = 0
-                else:
-                    new_signals.append(0)
-            elif pos == -1:
-                if price > entry_price * (1 + trailing_stop_pct):
-                    new_signals.append(1)
-                    pos = 0
-                else:
-                    new_signals.append(0)
-            else:
-                new_signals.append(0)
-
-        return pd.Series(new_signals, index=signals.index)
+        # Exits when price moves trailing_stop_pct against the entry price (a fixed stop from entry).
+        return StopFilter(stop_loss=trailing_stop_pct).apply(signals, self.data['close'])
 
     def plot_signals(self, signals: pd.Series):
+        plt = pyplot()
         plt.figure(figsize=(14, 6))
         plt.plot(self.data['close'], label='Close Price', alpha=0.7)
         buy_signals = self.data['close'][signals == 1]
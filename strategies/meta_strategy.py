@@ -1,23 +1,80 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from strategies.base_strategy import BaseStrategy
+from utils.feature_pipeline import data_version
+from utils.instrumentation import timed
+from utils.optional import pyplot
 
 class MetaStrategy(BaseStrategy):
-    def __init__(self, strategies: list, weights: list = None):
+    # Children keep the inputs they were built with: to share indicators through a FeaturePipeline,
+    # pass it to each child (features=...) when constructing them.
+    def __init__(self, strategies: list, weights: list = None, max_workers: int = None,
+                 executor: str = 'thread'):
         self.strategies = strategies
         self.weights = weights if weights else [1 / len(strategies)] * len(strategies)
+        self.max_workers = max_workers or 1
+        self.executor = executor
+        self._cache = None
 
-    def generate_signals(self, data: pd.DataFrame) -> pd.Series:
-        signal_df = pd.DataFrame(index=data.index)
-        for i, strategy in enumerate(self.strategies):
-            strat_signal = strategy.generate_signals(data)
-            signal_df[f'strategy_{i}'] = strat_signal * self.weights[i]
-        return signal_df.sum(axis=1).apply(np.sign)
+    @property
+    def uses_random(self) -> bool:
+        return any(getattr(s, 'uses_random', True) for s in self.strategies)
+
+    def child_signals(self, data: pd.DataFrame) -> np.ndarray:
+        # (strategies x time) array, or (strategies x time x tickers) when a child returns a panel.
+        # Cached per data version, so changing `weights` never regenerates the children; call
+        # clear_cache() after retraining a child.
+        version = data_version(data)
+        if self._cache is not None and self._cache[0] == version:
+            return self._cache[1]
+
+        # With max_workers > 1, children that draw from the global RNG still run here, in order,
+        # so their draws (and the parent's RNG state afterwards) match a sequential run.
+        parallel = [i for i, s in enumerate(self.strategies) if not getattr(s, 'uses_random', True)]
+        outputs = [None] * len(self.strategies)
+        if self.max_workers > 1 and len(parallel) > 1:
+            pool_type = ProcessPoolExecutor if self.executor == 'process' else ThreadPoolExecutor
+            with pool_type(max_workers=self.max_workers) as pool:
+                futures = {i: pool.submit(_generate, self.strategies[i], data) for i in parallel}
+                for i, strategy in enumerate(self.strategies):
+                    if i not in futures:
+                        outputs[i] = strategy.generate_signals(data)
+                for i, future in futures.items():
+                    outputs[i] = future.result()
+        else:
+            outputs = [strategy.generate_signals(data) for strategy in self.strategies]
+
+        panels = [o for o in outputs if isinstance(o, pd.DataFrame)]
+        columns = panels[0].columns if panels else None
+        stack = np.zeros((len(outputs), len(data.index)) + ((len(columns),) if panels else ()))
+        for i, output in enumerate(outputs):
+            if isinstance(output, pd.DataFrame):
+                values = output.reindex(index=data.index, columns=columns).to_numpy(dtype=float)
+            else:
+                values = output.reindex(data.index).to_numpy(dtype=float)
+                if panels:
+                    values = values[:, None]  # a single-series signal applies to every ticker
+            stack[i] = np.nan_to_num(values)
+
+        self._cache = (version, stack, columns)
+        return stack
 
+    def clear_cache(self):
+        self._cache = None
+
+    @timed('signals.meta')
+    def generate_signals(self, data: pd.DataFrame) -> pd.Series:
+        stack = self.child_signals(data)
+        combined = np.sign(np.tensordot(np.asarray(self.weights, dtype=float), stack, axes=1))
+        columns = self._cache[2]
+        if columns is not None:
+            return pd.DataFrame(combined, index=data.index, columns=columns)
+        return pd.Series(combined, index=data.index)
 
     def plot_signals(self, signals: pd.Series, data: pd.DataFrame):
+        plt = pyplot()
         plt.figure(figsize=(14, 6))
         plt.plot(data['close'], label='Price', alpha=0.7)
 
@@ -34,3 +91,7 @@ class MetaStrategy(BaseStrategy):
         plt.grid(True)
         plt.tight_layout()
         plt.show()
+
+
+def _generate(strategy, data):
+    return strategy.generate_signals(data)
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+
+def stop_filter(prices, signals, stop_loss=None, take_profit=None, trailing_stop=None, max_holding=None):
+    # Path-dependent exit rules applied to entry signals, without a per-bar loop.
+    #
+    # A nonzero signal opens a position in its direction at that bar's price. The position is closed
+    # by emitting the opposite unit signal on the first later bar, before the next entry, where:
+    #   stop_loss      price moves against the entry by more than the given fraction,
+    #   take_profit    price moves in favour of the entry by more than the given fraction,
+    #   trailing_stop  price retreats by more than the given fraction from its best level since entry,
+    #   max_holding    the position has been held for that many bars.
+    #
+    # prices and signals are (time,) or (time x series). Each rule is None, a scalar, or a 1-D array of
+    # alternatives; arrays are broadcast together into a trailing parameter axis of the output.
+    prices = np.asarray(prices, dtype=float)
+    signals = np.asarray(signals)
+    rules = [stop_loss, take_profit, trailing_stop, max_holding]
+    batched = any(np.ndim(r) > 0 for r in rules)
+    stop_loss, take_profit, trailing_stop, max_holding = np.broadcast_arrays(
+        *[np.atleast_1d(np.asarray(np.nan if r is None else r, dtype=float)) for r in rules])
+
+    T = len(signals)
+    price = prices.reshape(T, -1)
+    raw = signals.reshape(T, -1)
+    cols = np.arange(raw.shape[1])
+    bars = np.arange(T)[:, None]
+
+    entry = np.sign(raw) != 0
+    entry_bar = np.maximum.accumulate(np.where(entry, bars, -1), axis=0)
+    held_since = np.maximum(entry_bar, 0)
+    direction = np.where(entry_bar >= 0, np.sign(raw)[held_since, cols], 0)
+    in_trade = (entry_bar >= 0) & (bars > entry_bar)
+    long = ((direction == 1) & in_trade)[..., None]
+    short = ((direction == -1) & in_trade)[..., None]
+    entry_price = price[held_since, cols][..., None]
+    p = price[..., None]
+
+    exit_ = np.zeros(raw.shape + stop_loss.shape, dtype=bool)
+    if not np.isnan(stop_loss).all():
+        exit_ |= long & (p < entry_price * (1 - stop_loss)) | short & (p > entry_price * (1 + stop_loss))
+    if not np.isnan(take_profit).all():
+        exit_ |= long & (p > entry_price * (1 + take_profit)) | short & (p < entry_price * (1 - take_profit))
+    if not np.isnan(trailing_stop).all():
+        segment = np.cumsum(entry, axis=0)
+        peak = _segment_extreme(price, segment, highest=True)[..., None]
+        trough = _segment_extreme(price, segment, highest=False)[..., None]
+        exit_ |= long & (p < peak * (1 - trailing_stop)) | short & (p > trough * (1 + trailing_stop))
+    if not np.isnan(max_holding).all():
+        exit_ |= (long | short) & ((bars - entry_bar)[..., None] >= max_holding)
+
+    # Only the first exit after each entry counts; later ones would close an already flat position.
+    exits_so_far = np.cumsum(exit_, axis=0)
+    at_entry = np.take_along_axis(exits_so_far, np.broadcast_to(held_since[..., None], exit_.shape), axis=0)
+    first_exit = exit_ & (exits_so_far - at_entry == 1)
+
+    filtered = np.where(entry, raw, 0)[..., None]
+    filtered = np.where(first_exit, -direction[..., None], filtered)
+    if not batched:
+        return filtered[..., 0].reshape(signals.shape)
+    return filtered.reshape(signals.shape + stop_loss.shape)
+
+
+def _segment_extreme(price, segment, highest=True):
+    # Running max (or min) of each column that restarts whenever `segment` increases. Prices are
+    # replaced by their integer rank so the restart offset can be added without rounding.
+    T = len(price)
+    order = np.argsort(price if highest else -price, axis=0, kind='stable')
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(T)[:, None], axis=0)
+    running = np.maximum.accumulate(segment * T + rank, axis=0) - segment * T
+    return np.take_along_axis(price, np.take_along_axis(order, running, axis=0), axis=0)
+
+
+class StopFilter:
+    # Wraps stop_filter for strategies: apply() takes the strategy's signals and the close prices and
+    # returns filtered signals of the same type.
+    def __init__(self, stop_loss=None, take_profit=None, trailing_stop=None, max_holding=None):
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.trailing_stop = trailing_stop
+        self.max_holding = max_holding
+
+    def apply(self, signals, close):
+        if isinstance(close, pd.DataFrame) and isinstance(signals, pd.Series):
+            close = close.iloc[:, 0]
+        filtered = stop_filter(np.asarray(close, dtype=float), np.asarray(signals),
+                               stop_loss=self.stop_loss, take_profit=self.take_profit,
+                               trailing_stop=self.trailing_stop, max_holding=self.max_holding)
+        if isinstance(signals, pd.DataFrame):
+            return pd.DataFrame(filtered, index=signals.index, columns=signals.columns)
+        if isinstance(signals, pd.Series):
+            return pd.Series(filtered, index=signals.index)
+        return filtered
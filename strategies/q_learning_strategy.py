@@ -3,111 +3,137 @@
 import numpy as np
 import pandas as pd
 from strategies.base_strategy import BaseStrategy
+from utils.feature_discretizer import FeatureDiscretizer
+from utils.instrumentation import timed
 import random
-import collections.abc
 
 class QTable:
-    def __init__(self, actions, learning_rate=0.1, discount=0.9, epsilon=0.1):
-        from collections import defaultdict
+    # Dense Q-array: one row per discretized state, packed into an int code by encode(). `edges`
+    # holds the (num_features, bins + 1) bin edges the states were labelled with, once known; the
+    # codes only mean something together with them.
+    def __init__(self, actions, learning_rate=0.1, discount=0.9, epsilon=0.1, bins=10, num_features=4):
         self.actions = actions
         self.lr = learning_rate
         self.gamma = discount
         self.epsilon = epsilon
+        self.bins = bins
+        self.num_features = num_features
+        self.powers = bins ** np.arange(num_features - 1, -1, -1, dtype=np.int64)
 
-        self.q = defaultdict(lambda: [0.0] * len(self.actions))  # 👈 KILLS None once and for all
-
-    def _sanitize_state(self, state):
-        return tuple([0 if pd.isna(x) else int(x) for x in state])
+        self.q = np.zeros((bins ** num_features, len(actions)))
+        self.edges = None
 
-    def get(self, state):
-        state = self._sanitize_state(state)
-        val = self.q[state]
+    def encode(self, states) -> np.ndarray:
+        # Packs (..., num_features) bin labels into state codes; NaN labels count as bin 0.
+        labels = np.nan_to_num(np.asarray(states, dtype=float), nan=0.0).astype(np.int64)
+        return np.clip(labels, 0, self.bins - 1) @ self.powers
 
-        # Double check corruption
-        if not isinstance(val, list) or len(val) != len(self.actions) or any(
-            not isinstance(v, (int, float)) for v in val
-        ):
-            print(f"[FORCE REBUILD Q] Q[{state}] was corrupted → {val}")
-            self.q[state] = [0.0] * len(self.actions)
+    def _code(self, state):
+        return int(state) if np.ndim(state) == 0 else int(self.encode(state))
 
-        return self.q[state]
+    def get(self, state):
+        return self.q[self._code(state)]
 
     def update(self, state, action_idx, reward, next_state):
-        state = self._sanitize_state(state)
-        next_state = self._sanitize_state(next_state)
-
         q_current = self.get(state)
-        q_next = self.get(next_state)
-
-        max_next = max(q_next)
+        max_next = self.get(next_state).max()
         q_current[action_idx] += self.lr * (reward + self.gamma * max_next - q_current[action_idx])
 
     def select_action(self, state):
-        state = self._sanitize_state(state)
         q_vals = self.get(state)
         if random.random() < self.epsilon:
             return random.randint(0, len(self.actions) - 1)
         return int(np.argmax(q_vals))
 
     def get_confidence(self, state):
-        state = self._sanitize_state(state)
         q_vals = self.get(state)
-        return max(q_vals) / (sum(abs(v) for v in q_vals) + 1e-6)
+        return q_vals.max() / (np.abs(q_vals).sum() + 1e-6)
+
+    def confidence(self, codes: np.ndarray) -> np.ndarray:
+        q_vals = self.q[codes]
+        return q_vals.max(axis=1) / (np.abs(q_vals).sum(axis=1) + 1e-6)
+
+    def save(self, path: str):
+        # Only visited (nonzero) rows are written, which is a small fraction of bins**num_features.
+        codes = np.flatnonzero(self.q.any(axis=1))
+        extra = {} if self.edges is None else {'edges': np.asarray(self.edges, dtype=float)}
+        np.savez(path, codes=codes.astype(np.int32), rows=self.q[codes], actions=np.asarray(self.actions),
+                 params=np.array([self.lr, self.gamma, self.epsilon, self.bins, self.num_features]), **extra)
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as f:
+            lr, gamma, epsilon, bins, num_features = f['params'].tolist()
+            table = cls(f['actions'].tolist(), learning_rate=lr, discount=gamma, epsilon=epsilon,
+                        bins=int(bins), num_features=int(num_features))
+            table.q[f['codes']] = f['rows']
+            if 'edges' in f.files:
+                table.edges = f['edges']
+        return table
 
 
 class QLearningStrategy(BaseStrategy):
-    def __init__(self, data: pd.DataFrame, bins=10):
+    uses_random = True
+
+    def __init__(self, data: pd.DataFrame, bins=10, features=None):
         self.data = data
         self.actions = [-1, 0, 1]  # sell, hold, buy
-        self.qtable = QTable(self.actions)
+        self.qtable = QTable(self.actions, bins=bins)
         self.bins = bins
-
-    def _discretize(self, window=5):
-        pct = self.data['kalman'].pct_change().fillna(0)
-        ma = self.data['kalman'].rolling(window).mean().bfill()
-        deviation = (self.data['kalman'] - ma) / self.data['kalman']
-        vol = pct.rolling(window).std().bfill()
-        cycle = self.data['fourier'] - self.data['kalman']
-
-        d1 = pd.cut(pct, self.bins, labels=False)
-        d2 = pd.cut(deviation, self.bins, labels=False)
-        d3 = pd.cut(vol, self.bins, labels=False)
-        d4 = pd.cut(cycle, self.bins, labels=False)
-
-        return list(zip(d1, d2, d3, d4))
-
+        self.discretizer = FeatureDiscretizer(bins=bins, features=features)
+
+    def _state_codes(self) -> np.ndarray:
+        # The bin edges are frozen on first use, so train() and generate_signals() agree. A loaded
+        # or trainer-built qtable brings the edges it was trained with; otherwise they are fitted
+        # here and recorded on the qtable.
+        if self.discretizer.edges is None:
+            if self.qtable.edges is not None:
+                self.discretizer.edges = list(np.asarray(self.qtable.edges, dtype=float))
+            else:
+                self.discretizer.fit(self.data)
+                self.qtable.edges = np.array(self.discretizer.edges)
+        return self.qtable.encode(self.discretizer.transform(self.data))
+
+    def _close(self) -> np.ndarray:
+        close = self.data['close']
+        if isinstance(close, pd.DataFrame):
+            close = close.iloc[:, 0]
+        return close.to_numpy(dtype=float)
+
+    def _rewards(self) -> np.ndarray:
+        # Reward of each action index (sell, hold, buy) at every step, computed once for all episodes.
+        change = np.diff(self._close())
+        return np.column_stack([-change, np.zeros_like(change), change])
+
+    @timed('train.q_learning', rows=lambda result, self, episodes=10: len(self.data) * episodes)
     def train(self, episodes=10):
-        states = self._discretize()
-        print(f"Training Q-learning on {len(states)} states for {episodes} episodes")
+        codes = self._state_codes().tolist()
+        print(f"Training Q-learning on {len(codes)} states for {episodes} episodes")
+
+        rewards = self._rewards().tolist()
+
+        # The episode loop is inherently sequential; it runs on plain lists with locals bound, and
+        # draws from `random` in the same order as QTable.select_action so results match for a seed.
+        table = self.qtable
+        q = table.q.tolist()
+        lr, gamma, epsilon = table.lr, table.gamma, table.epsilon
+        n_actions = len(self.actions)
+        rand, randint = random.random, random.randint
         for _ in range(episodes):
-            for t in range(len(states) - 1):
-                state = tuple([0 if pd.isna(x) else int(x) for x in states[t]])
-                next_state = tuple([0 if pd.isna(x) else int(x) for x in states[t + 1]])
-
-                action_idx = self.qtable.select_action(state)
-                action = self.actions[action_idx]
-
-                price_now = self.data['close'].iloc[t]
-                price_next = self.data['close'].iloc[t + 1]
-
-                reward = 0.0
-                if action == 1:
-                    reward = float((price_next - price_now).item()) if hasattr(price_next - price_now, 'item') else float(price_next - price_now)
-                elif action == -1:
-                    reward = float((price_now - price_next).item()) if hasattr(price_now - price_next, 'item') else float(price_now - price_next)
-
-                self.qtable.update(state, action_idx, reward, next_state)
-
+            for t in range(len(codes) - 1):
+                q_current = q[codes[t]]
+                if rand() < epsilon:
+                    action_idx = randint(0, n_actions - 1)
+                else:
+                    action_idx = max(range(n_actions), key=q_current.__getitem__)
+                max_next = max(q[codes[t + 1]])
+                q_current[action_idx] += lr * (rewards[t][action_idx] + gamma * max_next - q_current[action_idx])
+        table.q = np.array(q)
+
+    @timed('signals.q_learning')
     def generate_signals(self, data: pd.DataFrame) -> pd.Series:
-        signals = []
-        states = self._discretize()
-        for t in range(len(states)):
-            state = tuple([0 if pd.isna(x) else int(x) for x in states[t]])
-            action_idx = self.qtable.select_action(state)
-            confidence = self.qtable.get_confidence(state)
-
-            base_signal = self.actions[action_idx]
-            weighted_signal = int(np.sign(base_signal) * confidence * 3)
-
-            signals.append(weighted_signal)
+        codes = self._state_codes()
+        actions = np.array([self.qtable.select_action(code) for code in codes.tolist()], dtype=int)
+        base_signal = np.asarray(self.actions)[actions]
+        signals = (np.sign(base_signal) * self.qtable.confidence(codes) * 3).astype(int)
         return pd.Series(signals, index=data.index)
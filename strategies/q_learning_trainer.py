@@ -0,0 +1,206 @@
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from strategies.q_learning_strategy import QLearningStrategy, QTable
+from utils.shared_frame import SharedFrame, attach_frame
+
+AGENT_DEFAULTS = {
+    'seed': 0,
+    'bins': 10,
+    'learning_rate': 0.1,
+    'discount': 0.9,
+    'epsilon': 0.1,
+    'episodes': 10,
+}
+
+
+def agent_grid(symbols: list, **options) -> list:
+    # One agent config per combination, e.g. agent_grid(['AAPL'], seed=range(8), epsilon=[0.05, 0.1]).
+    options = {k: list(v) if isinstance(v, (list, tuple, range)) else [v] for k, v in options.items()}
+    keys = list(options)
+    return [{**AGENT_DEFAULTS, 'symbol': symbol, **dict(zip(keys, values))}
+            for symbol in symbols for values in itertools.product(*(options[k] for k in keys))]
+
+
+def _make_agent(data: pd.DataFrame, agent: dict) -> QLearningStrategy:
+    strategy = QLearningStrategy(data, bins=agent['bins'])
+    strategy.qtable = QTable(strategy.actions, learning_rate=agent['learning_rate'],
+                             discount=agent['discount'], epsilon=agent['epsilon'], bins=agent['bins'])
+    return strategy
+
+
+def greedy_score(q: np.ndarray, codes: np.ndarray, rewards: np.ndarray) -> float:
+    # In-sample reward of always taking the highest-valued action.
+    actions = q[codes[:-1]].argmax(axis=1)
+    return float(rewards[np.arange(len(actions)), actions].sum())
+
+
+_WORKER = {}
+
+
+def _init_worker(frame_specs: dict):
+    _WORKER['blocks'] = {}
+    _WORKER['frames'] = {}
+    for symbol, spec in frame_specs.items():
+        _WORKER['blocks'][symbol], _WORKER['frames'][symbol] = attach_frame(spec)
+
+
+def _train_agent(task_id: int, agent: dict):
+    random.seed(agent['seed'])
+    np.random.seed(agent['seed'])
+    strategy = _make_agent(_WORKER['frames'][agent['symbol']], agent)
+    strategy.train(episodes=agent['episodes'])
+    score = greedy_score(strategy.qtable.q, strategy._state_codes(), strategy._rewards())
+    return task_id, strategy.qtable.q, strategy.qtable.edges, score
+
+
+class QLearningTrainer:
+    # Trains many independent Q-learning agents (tickers x seeds x hyperparameters). frames maps
+    # symbol -> DataFrame with 'close', 'kalman' and 'fourier' columns.
+    #
+    # Each resulting QTable carries the bin edges its agent was trained with, so
+    #   strategy = QLearningStrategy(new_data, bins=table.bins); strategy.qtable = table
+    # labels new data the same way as in training.
+    def __init__(self, frames: dict, max_workers: int = None, progress: bool = True):
+        self.frames = frames
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.progress = progress
+        self.agents = []
+        self.qtables = []
+
+    def _results(self, agents: list, qs: list, edges: list, scores: list) -> pd.DataFrame:
+        self.agents = agents
+        self.qtables = []
+        for agent, q, agent_edges in zip(agents, qs, edges):
+            table = QTable([-1, 0, 1], learning_rate=agent['learning_rate'], discount=agent['discount'],
+                           epsilon=agent['epsilon'], bins=agent['bins'])
+            table.q = q
+            table.edges = agent_edges
+            self.qtables.append(table)
+        return pd.DataFrame(agents).assign(score=scores)
+
+    def train(self, agents: list) -> pd.DataFrame:
+        # One process-pool task per agent; each agent runs QLearningStrategy.train unchanged, so a
+        # given config reproduces the single-process result for its seed.
+        agents = [{**AGENT_DEFAULTS, **a} for a in agents]
+        qs = [None] * len(agents)
+        edges = [None] * len(agents)
+        scores = [None] * len(agents)
+        started = time.perf_counter()
+
+        frames = {symbol: SharedFrame(self.frames[symbol]) for symbol in sorted({a['symbol'] for a in agents})}
+        try:
+            specs = {symbol: frame.spec() for symbol, frame in frames.items()}
+            if self.max_workers == 1:
+                _init_worker(specs)
+                completed = (_train_agent(i, a) for i, a in enumerate(agents))
+                self._collect(completed, qs, edges, scores, started)
+                _WORKER.clear()
+            else:
+                with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                         initargs=(specs,)) as pool:
+                    futures = [pool.submit(_train_agent, i, a) for i, a in enumerate(agents)]
+                    self._collect((f.result() for f in as_completed(futures)), qs, edges, scores, started)
+        finally:
+            for frame in frames.values():
+                frame.close()
+        return self._results(agents, qs, edges, scores)
+
+    def _collect(self, completed, qs, edges, scores, started):
+        total = len(qs)
+        for done, (task_id, q, agent_edges, score) in enumerate(completed, start=1):
+            qs[task_id] = q
+            edges[task_id] = agent_edges
+            scores[task_id] = score
+            if self.progress:
+                print(f"[trainer] {done}/{total} agents ({time.perf_counter() - started:.1f}s)")
+
+    def train_lockstep(self, agents: list, seed: int = 0) -> pd.DataFrame:
+        # Vectorized environments: all agents step through their (equal-length) histories together,
+        # one NumPy operation per step for the whole batch. Exploration draws come from a single
+        # generator seeded by `seed` and the agents' seeds, so results are reproducible but not
+        # identical to train().
+        agents = [{**AGENT_DEFAULTS, **a} for a in agents]
+        prepared = [_make_agent(self.frames[a['symbol']], a) for a in agents]
+        codes = [s._state_codes() for s in prepared]
+        if len({len(c) for c in codes}) > 1:
+            raise ValueError("Lockstep training needs histories of equal length")
+
+        codes = np.stack(codes)
+        rewards = np.stack([s._rewards() for s in prepared])
+        n_agents, n_steps = codes.shape
+        rows = np.arange(n_agents)
+        q = np.zeros((n_agents, max(s.qtable.q.shape[0] for s in prepared), len(prepared[0].actions)))
+        lr = np.array([a['learning_rate'] for a in agents])
+        gamma = np.array([a['discount'] for a in agents])
+        epsilon = np.array([a['epsilon'] for a in agents])
+        episodes = np.array([a['episodes'] for a in agents])
+        rng = np.random.default_rng([seed] + [a['seed'] for a in agents])
+
+        for episode in range(int(episodes.max(initial=0))):
+            active = episodes > episode
+            for t in range(n_steps - 1):
+                state, next_state = codes[:, t], codes[:, t + 1]
+                q_current = q[rows, state]
+                explore = rng.random(n_agents) < epsilon
+                action = np.where(explore, rng.integers(0, q.shape[2], n_agents), q_current.argmax(axis=1))
+                max_next = q[rows, next_state].max(axis=1)
+                value = q_current[rows, action]
+                updated = value + lr * (rewards[rows, t, action] + gamma * max_next - value)
+                q[rows, state, action] = np.where(active, updated, value)
+
+        qs = [q[i, :s.qtable.q.shape[0]].copy() for i, s in enumerate(prepared)]
+        scores = [greedy_score(qi, c, r) for qi, c, r in zip(qs, codes, rewards)]
+        return self._results(agents, qs, [s.qtable.edges for s in prepared], scores)
+
+    def best(self, results: pd.DataFrame, by: str = 'score') -> dict:
+        # Highest-scoring agent per symbol: {symbol: QTable}.
+        winners = results.loc[results.groupby('symbol')[by].idxmax()]
+        return {row.symbol: self.qtables[i] for i, row in winners.iterrows()}
+
+    def ensemble(self, results: pd.DataFrame, symbol: str) -> QTable:
+        # Averages the Q-values of a symbol's agents (all must share `bins` and bin edges).
+        members = results.index[results['symbol'] == symbol]
+        tables = [self.qtables[i] for i in members]
+        if len({t.bins for t in tables}) > 1:
+            raise ValueError("Ensembled agents must share the same bins")
+        if any(not np.array_equal(t.edges, tables[0].edges) for t in tables[1:]):
+            raise ValueError("Ensembled agents must share the same bin edges")
+        table = QTable(tables[0].actions, learning_rate=tables[0].lr, discount=tables[0].gamma,
+                       epsilon=tables[0].epsilon, bins=tables[0].bins)
+        table.q = np.mean([t.q for t in tables], axis=0)
+        table.edges = tables[0].edges
+        return table
+
+    def save(self, path: str):
+        # All agents in one .npz: visited Q rows and bin edges per agent plus the configs as JSON.
+        arrays = {'agents': np.array(json.dumps(self.agents, default=int))}
+        for i, table in enumerate(self.qtables):
+            codes = np.flatnonzero(table.q.any(axis=1))
+            arrays[f'codes_{i}'] = codes.astype(np.int32)
+            arrays[f'rows_{i}'] = table.q[codes]
+            if table.edges is not None:
+                arrays[f'edges_{i}'] = np.asarray(table.edges, dtype=float)
+        np.savez(path, **arrays)
+
+    @staticmethod
+    def load(path: str):
+        # Returns (agent configs, QTables) as written by save().
+        with np.load(path) as f:
+            agents = json.loads(f['agents'].item())
+            tables = []
+            for i, agent in enumerate(agents):
+                table = QTable([-1, 0, 1], learning_rate=agent['learning_rate'], discount=agent['discount'],
+                               epsilon=agent['epsilon'], bins=agent['bins'])
+                table.q[f[f'codes_{i}']] = f[f'rows_{i}']
+                if f'edges_{i}' in f.files:
+                    table.edges = f[f'edges_{i}']
+                tables.append(table)
+        return agents, tables
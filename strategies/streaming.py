@@ -0,0 +1,60 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from models.fourier_filter import SlidingFourierFilter
+from models.kalman_filter import OnlineKalmanFilter
+
+
+class StreamingStrategy:
+    # Incremental counterpart of BaseStrategy: receives one bar at a time and returns a signal.
+    def on_bar(self, bar) -> int:
+        raise NotImplementedError("Must implement on_bar method")
+
+
+class KalmanTrendStream(StreamingStrategy):
+    # KalmanTrendStrategy bar by bar; gives the same signals as the batch strategy on the same bars.
+    def __init__(self, slope_threshold: float = 0.001, R=0.01, Q=1e-5):
+        self.slope_threshold = slope_threshold
+        self.filter = OnlineKalmanFilter(R=R, Q=Q)
+        self.previous = None
+
+    def on_bar(self, bar) -> int:
+        trend = self.filter.update(bar.close)
+        slope = 0.0 if self.previous is None else trend - self.previous
+        self.previous = trend
+        if slope > self.slope_threshold:
+            return 1
+        if slope < -self.slope_threshold:
+            return -1
+        return 0
+
+
+class FourierCycleStream(StreamingStrategy):
+    # FourierCycleStrategy on a causal sliding-window cycle, since the batch FFT needs the future.
+    def __init__(self, threshold: float = 0.01, window: int = 256, keep_ratio: float = 0.05):
+        self.threshold = threshold
+        self.filter = SlidingFourierFilter(window=window, keep_ratio=keep_ratio)
+
+    def on_bar(self, bar) -> int:
+        residual = self.filter.update(bar.close) - bar.close
+        if residual > self.threshold:
+            return -1  # Price above cycle → sell
+        if residual < -self.threshold:
+            return 1   # Price below cycle → buy
+        return 0
+
+
+class RollingWindowStream(StreamingStrategy):
+    # Runs any batch strategy on the last `lookback` bars and emits its latest signal. make_strategy
+    # takes the window DataFrame and returns a strategy, e.g. lambda df: MetaStrategy([...]).
+    def __init__(self, make_strategy, lookback: int = 250):
+        self.make_strategy = make_strategy
+        self.bars = deque(maxlen=lookback)
+
+    def on_bar(self, bar) -> int:
+        self.bars.append(bar)
+        window = pd.DataFrame(list(self.bars), columns=bar._fields).set_index('timestamp')
+        signals = self.make_strategy(window).generate_signals(window)
+        return int(np.asarray(signals)[-1])
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from data_loader.cache import MarketDataCache
+from data_loader.data_loader import DataLoader
+from data_loader.providers import OHLCV, DataProvider, LocalProvider
+
+
+class OfflineProvider(DataProvider):
+    def __init__(self):
+        self.calls = []
+
+    def fetch(self, symbol, start, end, interval="1d"):
+        self.calls.append((start, end))
+        raise ConnectionError("offline")
+
+
+class CountingProvider(LocalProvider):
+    def __init__(self, frames):
+        super().__init__(frames)
+        self.calls = []
+
+    def fetch(self, symbol, start, end, interval="1d"):
+        self.calls.append((pd.Timestamp(start), pd.Timestamp(end)))
+        return super().fetch(symbol, start, end, interval)
+
+
+def _bars(start="2024-01-01", end="2024-06-30"):
+    index = pd.bdate_range(start, end, name='timestamp')
+    rng = np.random.default_rng(0)
+    close = 100 + rng.normal(size=len(index)).cumsum()
+    return pd.DataFrame({'open': close, 'high': close + 1, 'low': close - 1, 'close': close,
+                         'volume': rng.integers(1, 1000, len(index)).astype(float)}, index=index)[OHLCV]
+
+
+def test_closed_range_is_fetched_once(tmp_path):
+    bars = _bars()
+    provider = CountingProvider({'X': bars})
+    cache = MarketDataCache(str(tmp_path), provider)
+
+    first = cache.fetch('X', "2024-01-01", "2024-06-30")
+    assert len(provider.calls) == 1
+    assert cache.missing_ranges('X', "2024-01-01", "2024-06-30") == []
+
+    second = cache.fetch('X', "2024-01-01", "2024-06-30")
+    assert len(provider.calls) == 1
+    pd.testing.assert_frame_equal(first, second)
+    assert len(second) == len(bars[bars.index < "2024-06-30"])
+
+
+def test_cached_bars_are_served_when_provider_fails(tmp_path):
+    bars = _bars()
+    DataLoader.fetch('X', "2024-01-01", "2024-06-30", provider=LocalProvider({'X': bars}), cache_dir=str(tmp_path))
+
+    offline = OfflineProvider()
+    data = DataLoader.fetch('X', "2024-01-01", "2024-06-30", provider=offline, cache_dir=str(tmp_path))
+    assert offline.calls == []
+    assert len(data) == len(bars[bars.index < "2024-06-30"])
+
+    # A range reaching past the cache still returns the cached part.
+    data = DataLoader.fetch('X', "2024-01-01", "2024-07-31", provider=offline, cache_dir=str(tmp_path))
+    assert len(offline.calls) == 1
+    assert len(data) == len(bars[bars.index < "2024-06-30"])
+    cache = MarketDataCache(str(tmp_path), offline)
+    assert cache.missing_ranges('X', "2024-01-01", "2024-07-31") == [(pd.Timestamp("2024-06-30"), pd.Timestamp("2024-07-31"))]
+
+
+def test_open_ended_tail_is_refetched(tmp_path):
+    today = pd.Timestamp.now(tz='UTC').tz_localize(None).normalize()
+    bars = _bars(today - pd.Timedelta(days=30), today - pd.Timedelta(days=1))
+    provider = CountingProvider({'X': bars})
+    cache = MarketDataCache(str(tmp_path), provider)
+
+    cache.fetch('X', today - pd.Timedelta(days=30), today + pd.Timedelta(days=1))
+    gaps = cache.missing_ranges('X', today - pd.Timedelta(days=30), today + pd.Timedelta(days=1))
+    assert gaps == [(bars.index.max(), today + pd.Timedelta(days=1))]
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from utils.feature_pipeline import data_version
+from utils.instrumentation import timed
+
+# The raw columns the features read, directly or through the pipeline's nodes.
+FEATURE_COLUMNS = ('close', 'kalman', 'fourier')
+
+
+class FeatureDiscretizer:
+    # Discretizes the Q-learning features (Kalman returns, deviation from the moving average,
+    # volatility, Fourier cycle residual) into `bins` equal-width bins per feature.
+    #
+    # fit() freezes the bin edges, so training and inference label bars the same way. transform()
+    # caches the labels for the data it last saw and, when that data has only had bars appended,
+    # labels just the new bars. With a FeaturePipeline, the features come from its shared nodes
+    # (and their configured windows) instead of being recomputed here.
+    def __init__(self, bins=10, window=5, features=None):
+        self.bins = bins
+        self.window = window
+        self.pipeline = features
+        self.edges = None
+        self._labels = None
+        self._version = None
+
+    def features(self, data: pd.DataFrame) -> np.ndarray:
+        if self.pipeline is not None:
+            kalman = self.pipeline.get(data, 'kalman')
+            pct = self.pipeline.get(data, 'kalman_returns')
+            ma = self.pipeline.get(data, 'kalman_ma')
+            vol = self.pipeline.get(data, 'kalman_vol')
+            cycle = self.pipeline.get(data, 'kalman_cycle')
+        else:
+            kalman = data['kalman']
+            pct = kalman.pct_change().fillna(0)
+            ma = kalman.rolling(self.window).mean().bfill()
+            vol = pct.rolling(self.window).std().bfill()
+            cycle = data['fourier'] - kalman
+        deviation = (kalman - ma) / kalman
+        return np.column_stack([np.asarray(f, dtype=float) for f in (pct, deviation, vol, cycle)])
+
+    @timed('discretize.fit')
+    def fit(self, data: pd.DataFrame):
+        # Same edges as pd.cut(feature, bins), including its widening of the lowest edge.
+        feats = self.features(data)
+        self.edges = [pd.cut(feats[:, k], self.bins, retbins=True)[1] for k in range(feats.shape[1])]
+        self._labels = self._label(feats)
+        self._version = data_version(data, FEATURE_COLUMNS)
+        return self
+
+    def _label(self, feats: np.ndarray) -> np.ndarray:
+        # Right-closed bins as in pd.cut; values outside the fitted range go to the nearest end bin
+        # and missing values to bin 0.
+        labels = np.empty(feats.shape, dtype=np.int64)
+        for k, edges in enumerate(self.edges):
+            labels[:, k] = np.clip(np.searchsorted(edges, feats[:, k], side='left') - 1, 0, self.bins - 1)
+        labels[np.isnan(feats)] = 0
+        return labels
+
+    @timed('discretize.transform')
+    def transform(self, data: pd.DataFrame) -> np.ndarray:
+        if self.edges is None:
+            raise ValueError("FeatureDiscretizer must be fitted first")
+
+        version = data_version(data, FEATURE_COLUMNS)
+        if version == self._version:
+            return self._labels
+
+        cached = 0 if self._version is None else self._version[0]
+        # A pipeline's filters are not local in time, so only column-based features can be extended.
+        if (self.pipeline is None and 0 < cached < len(data)
+                and data_version(data.iloc[:cached], FEATURE_COLUMNS) == self._version):
+            # Appended bars: recompute features on a tail long enough to fill the rolling windows.
+            start = max(cached - self.window - 1, 0)
+            new = self._label(self.features(data.iloc[start:])[cached - start:])
+            labels = np.concatenate([self._labels, new])
+        else:
+            labels = self._label(self.features(data))
+
+        self._labels, self._version = labels, version
+        return labels
+
+    def fit_transform(self, data: pd.DataFrame) -> np.ndarray:
+        return self.fit(data)._labels
+
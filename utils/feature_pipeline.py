@@ -0,0 +1,159 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from models.fourier_filter import FourierFilter
+from models.kalman_filter import KalmanFilter
+from utils.instrumentation import timer
+from utils.state_encoder import encode_returns
+
+
+class FeaturePipeline:
+    # Registry of derived columns (indicators) forming a DAG over the raw data columns.
+    #
+    # Each node is computed at most once per (node, params, inputs): its cache key combines its
+    # parameters with the keys of its inputs, and raw columns are keyed by a hash of their contents.
+    # Changing a node's parameters or a raw column therefore only recomputes the nodes downstream of
+    # it, lazily on the next get(). Results are kept in an LRU cache of `max_entries` items.
+    #
+    # The cache may be shared by strategies running in threads: lookups and insertions hold a
+    # lock, while node functions run outside it (two threads missing the same key both compute
+    # it, and the second result replaces the first).
+    def __init__(self, max_entries: int = 128):
+        self.nodes = {}
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def register(self, name: str, func, inputs=('close',), **params):
+        # func(*input_values, **params) -> Series/DataFrame aligned with the data index.
+        self.nodes[name] = (func, tuple(inputs), params)
+        return self
+
+    def configure(self, name: str, **params):
+        func, inputs, current = self.nodes[name]
+        self.nodes[name] = (func, inputs, {**current, **params})
+        return self
+
+    def get(self, data: pd.DataFrame, name: str):
+        return self._resolve(data, name, {})[1]
+
+    def materialize(self, data: pd.DataFrame, names) -> pd.DataFrame:
+        # Writes the named nodes into `data` as columns, for strategies that read data[name].
+        for name in names:
+            data[name] = self.get(data, name)
+        return data
+
+    def _resolve(self, data, name, raw_keys):
+        if name not in self.nodes:
+            if name not in raw_keys:
+                raw_keys[name] = _raw(data, name)
+            return raw_keys[name]
+
+        func, inputs, params = self.nodes[name]
+        resolved = [self._resolve(data, i, raw_keys) for i in inputs]
+        key = (name, tuple(sorted(params.items())), tuple(k for k, _ in resolved))
+        with self._lock:
+            if key in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(key)
+                return key, self.cache[key]
+            self.misses += 1
+
+        with timer(f'feature.{name}', rows=len(data)):
+            value = func(*(v for _, v in resolved), **params)
+        with self._lock:
+            self.cache[key] = value
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return key, value
+
+    def clear(self):
+        with self._lock:
+            self.cache.clear()
+
+
+def data_version(data: pd.DataFrame, columns=None) -> tuple:
+    # Fingerprint of a frame's contents: its length and a hash of the index and of `columns`
+    # (default: every numeric column), as _raw() keys the raw inputs. Any edited bar changes it.
+    if columns is None:
+        frame = data.select_dtypes('number')
+    else:
+        frame = data[[c for c in columns if c in data.columns]]
+    if frame.shape[1] == 0:
+        frame = data.index.to_frame(index=False)
+    digest = int(pd.util.hash_pandas_object(frame, index=True).to_numpy().sum())
+    return len(data), digest
+
+
+def _raw(data: pd.DataFrame, name: str):
+    column = data[name]
+    if isinstance(column, pd.DataFrame) and column.shape[1] == 1:
+        column = column.iloc[:, 0]
+    digest = int(pd.util.hash_pandas_object(column, index=True).to_numpy().sum())
+    return ('raw', name, len(column), digest), column
+
+
+def _kalman(close, R=0.01, Q=1e-5):
+    return KalmanFilter(R=R, Q=Q).apply(close)
+
+
+def _fourier(close, keep_ratio=0.05):
+    return FourierFilter(keep_ratio=keep_ratio).apply(close)
+
+
+def _returns(series):
+    return series.pct_change().fillna(0)
+
+
+def _diff(series):
+    return series.diff().fillna(0)
+
+
+def _rolling_mean(series, window=5):
+    return series.rolling(window).mean().bfill()
+
+
+def _rolling_vol(returns, window=5):
+    return returns.rolling(window).std().bfill()
+
+
+def _residual(smooth, base):
+    return smooth.sub(base, axis=0) if isinstance(smooth, pd.DataFrame) else smooth - base
+
+
+def _markov_states(returns, threshold=0.002):
+    states = encode_returns(returns.to_numpy(dtype=float), np.array([-threshold, threshold]))
+    if isinstance(returns, pd.DataFrame):
+        return pd.DataFrame(states, index=returns.index, columns=returns.columns)
+    return pd.Series(states, index=returns.index)
+
+
+def default_pipeline(max_entries: int = 128) -> FeaturePipeline:
+    # The indicators used by the bundled strategies.
+    return (FeaturePipeline(max_entries)
+            .register('kalman', _kalman, ('close',), R=0.01, Q=1e-5)
+            .register('fourier', _fourier, ('close',), keep_ratio=0.05)
+            .register('returns', _returns, ('close',))
+            .register('rolling_vol', _rolling_vol, ('returns',), window=5)
+            .register('markov_states', _markov_states, ('returns',), threshold=0.002)
+            .register('kalman_slope', _diff, ('kalman',))
+            .register('kalman_returns', _returns, ('kalman',))
+            .register('kalman_ma', _rolling_mean, ('kalman',), window=5)
+            .register('kalman_vol', _rolling_vol, ('kalman_returns',), window=5)
+            .register('cycle_residual', _residual, ('fourier', 'close'))
+            .register('kalman_cycle', _residual, ('fourier', 'kalman')))
@@ -0,0 +1,227 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+# Process-wide timers, counters and throughput gauges for the pipeline stages (load, filter,
+# discretize, train, signals, backtest). Disabled by default: a decorated call then costs one
+# attribute check and timer() returns a shared no-op context, so the hooks can stay in hot code.
+#
+#   from utils import instrumentation
+#   instrumentation.enable(allocations=True)
+#   ... run ...
+#   instrumentation.report()
+#   instrumentation.export('run_metrics.json')   # or .prom for Prometheus text format
+#
+# Setting the INSTRUMENT environment variable enables it at import time (INSTRUMENT=alloc also
+# tracks allocations).
+
+
+class _State:
+    enabled = False
+    allocations = False
+
+
+_STATE = _State()
+_NOOP = nullcontext()
+_STATS = {}
+_COUNTERS = {}
+_LOCAL = threading.local()
+
+
+def enable(allocations: bool = False):
+    _STATE.enabled = True
+    _STATE.allocations = allocations
+    if allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    _STATE.enabled = False
+    if _STATE.allocations and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _STATE.allocations = False
+
+
+def enabled() -> bool:
+    return _STATE.enabled
+
+
+def reset():
+    _STATS.clear()
+    _COUNTERS.clear()
+
+
+class _Timer:
+    __slots__ = ('name', 'rows', 'started', 'memory')
+
+    def __init__(self, name, rows):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        if _STATE.allocations:
+            # Nested timers each see their own peak; the enclosing one is credited with it on exit.
+            # tracemalloc is process-wide, so stages running concurrently in threads share counts.
+            stack = _alloc_stack()
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            stack.append([current, current])
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        allocated = peak = None
+        stack = _alloc_stack()
+        if _STATE.allocations and stack:
+            current, traced_peak = tracemalloc.get_traced_memory()
+            start, seen = stack.pop()
+            peak = max(seen, traced_peak, start) - start
+            allocated = current - start
+            if stack:
+                stack[-1][1] = max(stack[-1][1], start + peak)
+            tracemalloc.reset_peak()
+        record(self.name, elapsed, self.rows, allocated, peak)
+        return False
+
+
+def _alloc_stack() -> list:
+    stack = getattr(_LOCAL, 'stack', None)
+    if stack is None:
+        stack = _LOCAL.stack = []
+    return stack
+
+
+def timer(name: str, rows: int = None):
+    # with timer('backtest.run', rows=len(data)): ...   Rows feed the throughput gauge.
+    if not _STATE.enabled:
+        return _NOOP
+    return _Timer(name, rows)
+
+
+def timed(name: str = None, rows=None):
+    # Decorator form of timer(). `rows(result, *args, **kwargs)` gives the rows processed; by
+    # default the length of the result, or else of the first sized argument.
+    def decorate(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _STATE.enabled:
+                return func(*args, **kwargs)
+            with _Timer(label, None) as t:
+                result = func(*args, **kwargs)
+                t.rows = rows(result, *args, **kwargs) if rows else _rows(result, args)
+            return result
+        return wrapper
+    return decorate
+
+
+def _rows(result, args):
+    for value in (result,) + tuple(args):
+        if isinstance(value, (str, bytes, dict)):
+            continue
+        try:
+            return len(value)
+        except TypeError:
+            continue
+    return None
+
+
+def record(name: str, seconds: float, rows: int = None, allocated: int = None, peak: int = None):
+    stats = _STATS.get(name)
+    if stats is None:
+        stats = _STATS[name] = {'calls': 0, 'seconds': 0.0, 'min_seconds': float('inf'),
+                                'max_seconds': 0.0, 'rows': 0, 'allocated_bytes': 0, 'peak_bytes': 0}
+    stats['calls'] += 1
+    stats['seconds'] += seconds
+    stats['min_seconds'] = min(stats['min_seconds'], seconds)
+    stats['max_seconds'] = max(stats['max_seconds'], seconds)
+    if rows:
+        stats['rows'] += int(rows)
+    if allocated is not None:
+        stats['allocated_bytes'] += allocated
+        stats['peak_bytes'] = max(stats['peak_bytes'], peak)
+
+
+def count(name: str, value: float = 1):
+    if _STATE.enabled:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + value
+
+
+def merge(data: dict):
+    # Folds in a snapshot() taken elsewhere, e.g. returned by a worker process.
+    for name, stats in data['timers'].items():
+        if name not in _STATS:
+            _STATS[name] = {k: v for k, v in stats.items() if k != 'rows_per_sec'}
+            continue
+        current = _STATS[name]
+        for key in ('calls', 'seconds', 'rows', 'allocated_bytes'):
+            current[key] += stats[key]
+        current['min_seconds'] = min(current['min_seconds'], stats['min_seconds'])
+        for key in ('max_seconds', 'peak_bytes'):
+            current[key] = max(current[key], stats[key])
+    for name, value in data['counters'].items():
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + value
+
+
+def snapshot() -> dict:
+    timers = {}
+    for name, stats in _STATS.items():
+        timers[name] = {**stats, 'rows_per_sec': stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0}
+    return {'timers': timers, 'counters': dict(_COUNTERS)}
+
+
+def report(sort_by: str = 'seconds'):
+    # Per-stage table, slowest first.
+    timers = snapshot()['timers']
+    if not timers and not _COUNTERS:
+        print("No instrumentation recorded.")
+        return
+    width = max([len(n) for n in timers] + [len(n) for n in _COUNTERS] + [5])
+    print(f"\n{'stage':<{width}} {'calls':>6} {'total s':>9} {'mean ms':>9} {'max ms':>9} "
+          f"{'rows/s':>13} {'peak MiB':>9}")
+    for name, s in sorted(timers.items(), key=lambda item: -item[1][sort_by]):
+        print(f"{name:<{width}} {s['calls']:>6} {s['seconds']:>9.3f} {s['seconds'] / s['calls'] * 1e3:>9.2f} "
+              f"{s['max_seconds'] * 1e3:>9.2f} {s['rows_per_sec']:>13,.0f} {s['peak_bytes'] / 2 ** 20:>9.1f}")
+    for name, value in sorted(_COUNTERS.items()):
+        print(f"{name:<{width}} {value:>6}")
+
+
+def export(path: str):
+    # JSON, or Prometheus text exposition format when the path ends in .prom / .txt.
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    data = snapshot()
+    with open(path, 'w') as f:
+        if path.endswith(('.prom', '.txt')):
+            f.write(_prometheus(data))
+        else:
+            json.dump(data, f, indent=2)
+
+
+def _prometheus(data: dict) -> str:
+    lines = []
+    metrics = [('calls', 'counter'), ('seconds', 'counter'), ('max_seconds', 'gauge'), ('rows', 'counter'),
+               ('rows_per_sec', 'gauge'), ('allocated_bytes', 'counter'), ('peak_bytes', 'gauge')]
+    for field, kind in metrics:
+        metric = f"pipeline_stage_{field}" + ('_total' if kind == 'counter' else '')
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, stats in sorted(data['timers'].items()):
+            lines.append(f'{metric}{{stage="{name}"}} {stats[field]}')
+    if data['counters']:
+        lines.append("# TYPE pipeline_events_total counter")
+        for name, value in sorted(data['counters'].items()):
+            lines.append(f'pipeline_events_total{{name="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+if os.environ.get('INSTRUMENT'):
+    enable(allocations=os.environ['INSTRUMENT'].lower() in ('alloc', 'allocations'))
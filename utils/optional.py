@@ -0,0 +1,23 @@
+import importlib
+
+# Optional dependencies and the requirements file that provides each. Plotting and the Yahoo
+# provider import them on first use, so the core models, strategies and backtester only need
+# numpy and pandas (see requirements-core.txt).
+EXTRAS = {
+    'matplotlib': 'requirements-plot.txt',
+    'seaborn': 'requirements-plot.txt',
+    'yfinance': 'requirements-data.txt',
+}
+
+
+def require(module: str):
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        extra = EXTRAS.get(module.split('.')[0])
+        hint = f"; install it with pip install -r {extra}" if extra else ""
+        raise ImportError(f"{module} is required for this feature{hint}") from e
+
+
+def pyplot():
+    return require('matplotlib.pyplot')
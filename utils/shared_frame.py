@@ -0,0 +1,85 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+class SharedFrame:
+    # Numeric columns of a DataFrame copied once into shared memory, so pool workers attach to the
+    # buffer instead of receiving a pickled copy with every task. The attached frame has the same
+    # index as the original: datetime (with its timezone) and numeric indexes are shared too, a
+    # RangeIndex is rebuilt from its bounds, and any other index is pickled once into the spec.
+    def __init__(self, data: pd.DataFrame):
+        if isinstance(data.columns, pd.MultiIndex):
+            raise ValueError("Flatten MultiIndex columns before sharing")
+        values = np.ascontiguousarray(data.to_numpy(dtype=float))
+        self.columns = list(data.columns)
+
+        self._blocks = []
+        self.values_spec = self._share(values)
+        index = data.index
+        self.index_spec = None
+        if isinstance(index, pd.RangeIndex):
+            self.index_info = ('range', (index.start, index.stop, index.step, index.name))
+        elif isinstance(index, pd.DatetimeIndex):
+            self.index_spec = self._share(np.ascontiguousarray(index.as_unit('ns').asi8))
+            self.index_info = ('datetime', (index.tz, index.unit, index.freq, index.name))
+        elif not isinstance(index, pd.MultiIndex) and pd.api.types.is_numeric_dtype(index.dtype):
+            self.index_spec = self._share(np.ascontiguousarray(index.to_numpy()))
+            self.index_info = ('numeric', (index.name,))
+        else:
+            self.index_info = ('object', (index,))
+
+    def _share(self, array: np.ndarray):
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        self._blocks.append(shm)
+        return shm.name, array.shape, array.dtype.str
+
+    def spec(self) -> tuple:
+        return self.values_spec, self.index_spec, self.columns, self.index_info
+
+    def close(self):
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _attach(spec):
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def attach_frame(spec: tuple):
+    # Rebuilds a SharedFrame's DataFrame without copying. The returned shared memory handles must be
+    # kept referenced for as long as the frame is used.
+    values_spec, index_spec, columns, (kind, info) = spec
+    blocks = []
+    values_shm, values = _attach(values_spec)
+    blocks.append(values_shm)
+    if index_spec is not None:
+        index_shm, shared_index = _attach(index_spec)
+        blocks.append(index_shm)
+
+    if kind == 'range':
+        start, stop, step, name = info
+        index = pd.RangeIndex(start, stop, step, name=name)
+    elif kind == 'datetime':
+        tz, unit, freq, name = info
+        index = pd.DatetimeIndex(shared_index.view('datetime64[ns]'), name=name)
+        if tz is not None:
+            index = index.tz_localize('UTC').tz_convert(tz)
+        index = pd.DatetimeIndex(index.as_unit(unit), freq=freq)
+    elif kind == 'numeric':
+        index = pd.Index(shared_index, name=info[0], copy=False)
+    else:
+        index = info[0]
+    return tuple(blocks), pd.DataFrame(values, index=index, columns=columns, copy=False)
@@ -1,22 +1,81 @@
+import numpy as np
 import pandas as pd
-import re
 
-def encode_states(data: pd.DataFrame, threshold=0.002) -> pd.Series:
-    # Flatten MultiIndex if needed
-    if isinstance(data.columns, pd.MultiIndex):
-        data.columns = ['_'.join(col).strip().lower() for col in data.columns.values]
+
+def encode_states(data: pd.DataFrame, threshold=0.002, thresholds=None, quantiles=None):
+    # Maps close-to-close returns into discrete states, for one ticker or a whole panel at once.
+    #
+    # By default returns above `threshold` are state 2, below -threshold state 0 and the rest 1.
+    # `thresholds` gives explicit ascending return edges (len + 1 states), and `quantiles` an
+    # int (number of equally populated states) or a list of probabilities, with edges taken per
+    # ticker. Returns an int8 Series for a single close column, else a (time x tickers) DataFrame.
+    # The input frame is never modified.
+    close = close_panel(data)
+    returns = _returns(close.to_numpy(dtype=float))
+
+    if quantiles is not None:
+        probs = np.linspace(0, 1, quantiles + 1)[1:-1] if np.ndim(quantiles) == 0 else np.asarray(quantiles)
+        # The first row's return is a placeholder, so it is left out of the edges.
+        sample = returns[1:] if len(returns) > 1 else returns
+        edges = np.quantile(sample, probs, axis=0).T if len(sample) else np.zeros((returns.shape[1], len(probs)))
+    elif thresholds is not None:
+        edges = np.asarray(thresholds, dtype=float)
     else:
-        data.columns = data.columns.str.strip().str.lower()
+        edges = np.array([-threshold, threshold])
+    states = encode_returns(returns, edges)
+
+    if close.shape[1] == 1:
+        return pd.Series(states[:, 0], index=close.index, name='close')
+    return pd.DataFrame(states, index=close.index, columns=close.columns)
 
-    # Dynamically strip ticker suffixes like _aapl, _msft, etc.
-    data.columns = [re.sub(r'_(\w+)$', '', col) for col in data.columns]
 
-    # Confirm 'close' exists now
-    assert 'close' in data.columns, f"'close' not found in: {data.columns}"
+def encode_returns(returns: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    # int8 state of each return given ascending edges, shared (k,) or per column (columns x k).
+    # A return equal to an edge stays in the state nearer the middle, so with edges (-t, t) a
+    # return of exactly +-t is state 1, as in the original threshold rule.
+    returns = np.asarray(returns, dtype=float)
+    edges = np.asarray(edges, dtype=float)
+    if edges.shape[-1] + 1 > np.iinfo(np.int8).max:
+        raise ValueError("At most 127 states are supported")
+    half = edges.shape[-1] // 2
+    if edges.ndim == 1:
+        states = np.digitize(returns, edges[:half], right=False) + np.digitize(returns, edges[half:], right=True)
+    else:
+        states = ((returns[..., None] >= edges[:, :half]).sum(axis=-1)
+                  + (returns[..., None] > edges[:, half:]).sum(axis=-1))
+    return states.astype(np.int8)
+
 
-    # Calculate returns and map to states
-    returns = data['close'].pct_change().fillna(0)
-    states = returns.apply(lambda r: 2 if r > threshold else (0 if r < -threshold else 1))
+def close_panel(data: pd.DataFrame) -> pd.DataFrame:
+    # The close column(s) as a (time x tickers) frame, without copying or renaming the input.
+    # Handles MultiIndex downloads (a 'Close' level value next to the ticker level) and flat
+    # 'close' / 'Close' / 'close_<ticker>' columns.
+    columns = data.columns
+    if isinstance(columns, pd.MultiIndex):
+        for level in range(columns.nlevels):
+            names = columns.get_level_values(level).astype(str).str.strip().str.lower()
+            mask = np.asarray(names == 'close')
+            if mask.any():
+                close = data.loc[:, mask]
+                tickers = close.columns.droplevel(level)
+                if isinstance(tickers, pd.MultiIndex):
+                    tickers = tickers.map(lambda t: '_'.join(map(str, t)))
+                close.columns = tickers
+                return close
+    else:
+        names = columns.astype(str).str.strip().str.lower()
+        mask = np.asarray((names == 'close') | names.str.startswith('close_'))
+        if mask.any():
+            close = data.loc[:, mask]
+            close.columns = [n[len('close_'):] if n.startswith('close_') else n for n in names[mask]]
+            return close
+    raise ValueError(f"'close' not found in: {list(columns)}")
 
-    return states
 
+def _returns(close: np.ndarray) -> np.ndarray:
+    # Same as close.pct_change().fillna(0), with non-finite returns set to 0.
+    returns = np.zeros_like(close)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = close[1:] / close[:-1] - 1
+    returns[~np.isfinite(returns)] = 0
+    return returns